@@ -2,4 +2,8 @@ __version__ = "0.1.9"
 
 from avatarpy.avatar import Avatar
 from avatarpy.avalens import AvaLens
+from avatarpy.interval import Intervals
+from avatarpy.chunk import ChunkedAvatar
+from avatarpy.social import Social
 from avatarpy.dataset import dataset
+from avatarpy.stats import GroupStats
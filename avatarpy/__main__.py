@@ -0,0 +1,4 @@
+import sys
+from avatarpy.cli import main
+
+sys.exit(main())
@@ -2,7 +2,7 @@ import os
 import numpy as np
 import pandas as pd
 import warnings
-from sklearn import metrics
+from avatarpy.interval import Intervals
 
 class Annotation:
     def __init__(self, parent=None):
@@ -21,6 +21,9 @@ class Annotation:
         :returns: boolean array
         """
 
+        if isinstance(by, (list, tuple)):
+            return self.add_bulk(by, names=name, header=None) # header-less label files, same as single csv
+
         if isinstance(by, str):
             csv_path = by
             assert os.path.splitext(csv_path)[1].lower() == '.csv', 'Wrong file type error. provide .csv file'
@@ -51,6 +54,65 @@ class Annotation:
             raise Exception('Wrong argument type provided, should be function or csv file')
         return self.__annotation
 
+    def add_bulk(self, by, names=None, header='infer'):
+        """Adds many annotations at once from wide csv files or binary label files, and returns annotation dataframe
+
+        :param by: {str|list} path or list of paths. Each file may hold one or many labels.
+            .csv: columns are labels, names from header (or <basename>_<i> if header=None)
+            .npy: 1d or 2d (N x labels) array, named <basename>_<i>
+            .npz: each array is a label named by its key
+        :param names: list of label names overriding names from files
+        :param header: header argument of pd.read_csv for csv files
+
+        :returns: annotation dataframe
+        """
+        paths = [by] if isinstance(by, str) else list(by)
+        blocks, labels = [], []
+        for path in paths:
+            basename, ext = os.path.splitext(os.path.basename(path))
+            ext = ext.lower()
+            if ext == '.csv':
+                df = pd.read_csv(path, header=header)
+                block = df.values
+                labels.extend([str(c) for c in df.columns] if header is not None else 
+                    [basename if df.shape[1]==1 else f'{basename}_{i}' for i in range(df.shape[1])])
+            elif ext == '.npy':
+                block = np.load(path)
+                block = block.reshape(len(block), -1)
+                labels.extend([basename] if block.shape[1]==1 else [f'{basename}_{i}' for i in range(block.shape[1])])
+            elif ext == '.npz':
+                with np.load(path) as npz:
+                    keys = list(npz.keys())
+                    block = np.stack([npz[key].ravel() for key in keys], axis=1) if keys else np.empty((0, 0))
+                labels.extend(keys)
+            else:
+                raise Exception(f'Wrong file type error. provide .csv, .npy or .npz file: {path}')
+            blocks.append(block)
+
+        index = self.__parent.index
+        n_index = len(index)
+        data = np.zeros((n_index, len(labels)), dtype=bool)
+        col = 0
+        for path, block in zip(paths, blocks):
+            n_data, n_label = block.shape
+            if n_data != n_index:
+                warnings.warn(f'Warning your input file {path} length({n_data}) miss match with avatar index({n_index})')
+            n = min(n_data, n_index)
+            data[:n, col:col+n_label] = np.nan_to_num(block[:n].astype(np.float64), nan=0) # NaN tails of shorter columns are False
+            col += n_label
+
+        labels = ([names] if isinstance(names, str) else list(names)) if names else labels
+        assert len(labels) == data.shape[1], f'Number of names({len(labels)}) miss match with number of labels({data.shape[1]})'
+        return self.update(pd.DataFrame(data, index=index, columns=labels))
+
+    def update(self, labels):
+        """Registers boolean dataframe of labels indexed as avatar, replacing labels of same names, and returns annotation dataframe
+        """
+        labels = labels.astype(bool)
+        old = self.__annotation.drop(columns=labels.columns, errors='ignore')
+        self.__annotation = pd.concat([old, labels], axis=1) if len(old.columns) else labels
+        return self.__annotation
+
     def intersection(self, columns=[]):
         """Returns row wise intersection of annotation df
         """
@@ -77,6 +139,11 @@ class Annotation:
         """
         return self.__annotation.index[self.__annotation[name]]
 
+    def get_intervals(self, name):
+        """Returns annotation as start/stop frame position intervals. See also avatarpy.interval.Intervals
+        """
+        return Intervals.from_boolean(self.__annotation[name].values)
+
     def metrics(self, true, pred, includes=["confusion_matrix", "accuracy_score", "recall_score", "precision_score", "f1_score", "jaccard_score"]):
         """Returns metrics of given pred, true data
 
@@ -85,6 +152,8 @@ class Annotation:
 
         :returns: dict of metric
         """
+        from sklearn import metrics
+
         ret = {}
         for include in includes:
             metric_func = getattr(metrics, include)
@@ -94,3 +163,77 @@ class Annotation:
             ret[include] = metric_func(true, pred)
         return ret
 
+    def get_label_matrix(self, labels):
+        """Returns packed boolean matrix (N x labels) and label names
+
+        :param labels: list of annotation names or boolean pd.DataFrame
+        """
+        if isinstance(labels, pd.DataFrame):
+            return labels.values.astype(bool), list(labels.columns)
+        return self.__annotation[labels].values.astype(bool), list(labels)
+
+    @staticmethod
+    def get_confusion_tensor(true, pred):
+        """Returns confusion tensor (true labels x pred labels x 2 x 2) of all label pairs by one matrix product.
+        Last two axes follow sklearn.metrics.confusion_matrix layout [[tn, fp], [fn, tp]]
+
+        :param true: boolean array (N x M)
+        :param pred: boolean array (N x K)
+        """
+        n = len(true)
+        true, pred = true.astype(np.float64), pred.astype(np.float64)
+        tp = true.T @ pred
+        fn = true.sum(axis=0)[:, np.newaxis]-tp
+        fp = pred.sum(axis=0)[np.newaxis, :]-tp
+        tn = n-tp-fn-fp
+        return np.stack([np.stack([tn, fp], axis=-1), np.stack([fn, tp], axis=-1)], axis=-2).astype(np.int64)
+
+    def multi_metrics(self, true, pred):
+        """Returns metrics of all (true, pred) label pairs derived from single confusion tensor
+
+        :param true: list of annotation names or boolean pd.DataFrame of true labels
+        :param pred: list of annotation names or boolean pd.DataFrame of predicted labels
+
+        :returns: pd.DataFrame indexed by (true, pred)
+        """
+        true, true_names = self.get_label_matrix(true)
+        pred, pred_names = self.get_label_matrix(pred)
+        cm = self.get_confusion_tensor(true, pred)
+        tn, fp, fn, tp = cm[..., 0, 0], cm[..., 0, 1], cm[..., 1, 0], cm[..., 1, 1]
+        divide = lambda a, b: np.divide(a, b, out=np.zeros(a.shape), where=b>0)
+        precision, recall = divide(tp, tp+fp), divide(tp, tp+fn)
+        ret = dict(
+            tn=tn, fp=fp, fn=fn, tp=tp,
+            accuracy_score=(tp+tn)/len(true),
+            precision_score=precision,
+            recall_score=recall,
+            f1_score=divide(2*precision*recall, precision+recall),
+            jaccard_score=divide(tp, tp+fp+fn),
+        )
+        index = pd.MultiIndex.from_product([true_names, pred_names], names=['true', 'pred'])
+        return pd.DataFrame({k:v.ravel() for k, v in ret.items()}, index=index)
+
+    def event_metrics(self, true, pred):
+        """Returns event-level (bout overlap) metrics of all (true, pred) label pairs.
+        True bout is detected if any predicted bout overlaps it.
+
+        :param true: list of annotation names or boolean pd.DataFrame of true labels
+        :param pred: list of annotation names or boolean pd.DataFrame of predicted labels
+
+        :returns: pd.DataFrame indexed by (true, pred)
+        """
+        true, true_names = self.get_label_matrix(true)
+        pred, pred_names = self.get_label_matrix(pred)
+        true_intervals = [Intervals.from_boolean(col) for col in true.T]
+        pred_intervals = [Intervals.from_boolean(col) for col in pred.T]
+        rows = []
+        for t in true_intervals:
+            for p in pred_intervals:
+                detected, matched = t.overlaps(p).sum(), p.overlaps(t).sum()
+                recall = detected/len(t) if len(t) else 0.
+                precision = matched/len(p) if len(p) else 0.
+                f1 = 2*precision*recall/(precision+recall) if precision+recall else 0.
+                rows.append(dict(true_events=len(t), pred_events=len(p), detected=detected, matched=matched,
+                    precision_score=precision, recall_score=recall, f1_score=f1))
+        index = pd.MultiIndex.from_product([true_names, pred_names], names=['true', 'pred'])
+        return pd.DataFrame(rows, index=index)
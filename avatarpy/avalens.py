@@ -3,19 +3,27 @@ import numpy as np
 import pandas as pd
 from datetime import datetime
 from avatarpy import Avatar
+from avatarpy.interval import Intervals
+from avatarpy.embedding import Embedding
+from avatarpy.recording import Recording
+from avatarpy.loader import Prefetcher
 
 class AvaLens:
-    def __init__(self, id_policy='filepath', tag_policy='provide'):
+    def __init__(self, id_policy='filepath', tag_policy='provide', dtype=np.float64, resample_rate=None):
         r"""Lens for group analysis of avatars
 
         :param id_policy: {'filepath'(default))|'incremental'|'provide'|'basename'}
         :param tag_policy: {'provide'(default))|'dirname'}
+        :param dtype: {np.float64(default)|np.float32} dtype of avatar coordinates and features
+        :param resample_rate: if provided, all avatars are resampled to this frame rate at load time
         """
         assert id_policy in ['filepath','incremental','provide','basename'], 'wrong argument for id_policy'
         assert tag_policy in ['provide','dirname'], 'wrong argument for id_policy'
         self._avatars = []
         self.id_policy = id_policy
         self.tag_policy = tag_policy
+        self.dtype = dtype
+        self.resample_rate = resample_rate
 
     def __repr__(self):
         return f'AvaLens instance containing avatars: {self.avatars}'
@@ -25,7 +33,7 @@ class AvaLens:
         """User Added avatars"""
         return self._avatars
 
-    def add_file(self, csv_path, ID=None, tags={}, verbose=1):
+    def add_file(self, csv_path, ID=None, tags={}, verbose=1, lazy=False, frame_rate=20):
         if self.id_policy == 'filepath':
             ID = csv_path
         elif self.id_policy == 'incremental':
@@ -40,7 +48,7 @@ class AvaLens:
             tags = dict(tag=os.path.basename(os.path.dirname(csv_path)))
         elif self.tag_policy == 'provide':
             tags = tags
-        avatar = Avatar(csv_path=csv_path, ID=ID, tags=tags)
+        avatar = Avatar(csv_path=csv_path, frame_rate=frame_rate, ID=ID, tags=tags, lazy=lazy, dtype=self.dtype, resample_rate=self.resample_rate)
         self.avatars.append(avatar)
         if verbose==1:
             print(f'[{datetime.now()}] Added new Avatar(csv_path={csv_path}, ID={ID}, tags={tags})', end='\r')
@@ -48,21 +56,43 @@ class AvaLens:
             print(f'[{datetime.now()}] Added new Avatar(csv_path={csv_path}, ID={ID}, tags={tags})')
         return self
 
-    def add_folder(self, root, ID=None, tags={}, verbose=1):
+    def add_folder(self, root, ID=None, tags={}, verbose=1, lazy=False, frame_rate=20):
         for path, subdirs, files in os.walk(root):
             for name in files:
-                if name.lower().endswith('.csv'):
+                if name.lower().endswith(('.csv', Recording.extension)):
                     csv_path = os.path.join(path, name)
-                    self.add_file(csv_path, ID, tags, verbose=verbose)
+                    self.add_file(csv_path, ID, tags, verbose=verbose, lazy=lazy, frame_rate=frame_rate)
         return self
 
+    def prefetch(self, prefetch=2, workers=None, unload=True):
+        """Returns iterator over avatars loading next `prefetch` recordings on background threads, so I/O overlaps compute.
+        Add avatars with lazy=True (ex, lens.add_folder(root, lazy=True)). See Prefetcher
+
+        :param unload: if True, avatars loaded by iterator are unloaded after being processed, keeping memory bounded
+        """
+        return Prefetcher(self.avatars, prefetch=prefetch, workers=workers, unload=unload)
+
+    def save(self, directory):
+        """Saves all avatars as binary recordings (.ava) into directory, named after csv basename (or ID). Returns list of paths.
+        See Avatar.save
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for avatar in self.avatars:
+            name = os.path.splitext(os.path.basename(avatar.csv_path))[0] if isinstance(avatar.csv_path, str) else str(avatar.ID)
+            path = os.path.join(directory, name+Recording.extension)
+            if path in paths:
+                path = os.path.join(directory, f'{name}_{len(paths)}{Recording.extension}')
+            paths.append(avatar.save(path))
+        return paths
+
     def describe(self, include=['corr', 'stat'], func_kws={}, indices=None, assign_ID=True, assign_tags=True):
         describes = []
         for avatar in self.avatars:
             if func_kws:
                 for name, func in func_kws.items():
                     avatar.annotation.add(by=func, name=name)
-                    indices = avatar.annotation.get_indices(name)
+                    indices = avatar.annotation.get_intervals(name)
                     desc = avatar.describe(indices=indices, include=include, assign_ID=assign_ID, assign_tags=assign_tags).assign(event=name)
                     describes.append(desc)
             else:
@@ -70,35 +100,48 @@ class AvaLens:
                 describes.append(desc)
         return pd.concat(describes).reset_index(drop=True)
 
+    def gather_windows(self, window=20, stride=1, batch_size=1024, features=['velocity', 'acceleration', 'angle', 'angle_velocity', 'angle_acceleration', 'stretch_index'], flatten=False, dropna=False):
+        """Yields (avatar, starts, batch) of fixed-size feature windows over all avatars. See also Avatar.gather_windows
+        """
+        for avatar in self.avatars:
+            windows = avatar.gather_windows(window=window, stride=stride, batch_size=batch_size, features=features, flatten=flatten, dropna=dropna)
+            for starts, batch in windows:
+                yield avatar, starts, batch
+
+    def share(self, features=[], backend=None, directory=None):
+        """Returns list of picklable SharedAvatar handles of all avatars. See Avatar.share"""
+        return [avatar.share(features=features, backend=backend, directory=directory) for avatar in self.avatars]
+
     @property
     def search_event(self):
         return SearchEvent(parent=self)
 
+    @property
+    def embedding(self):
+        """Embedding pipeline of feature windows (ex, emb = lens.embedding(window='1s'); emb.transform())"""
+        return Embedding(parent=self)
+
 class SearchEvent:
     def __init__(self, parent=None):
         self.__parent = parent
         self.__events = []
+        self.__distances = []
         self.__event_name = ''
 
     def __call__(self, func, name, length=20, verbos=1):
         """Search event by given function.
+
+        :param length: (int|str) event length, int is frames, str is seconds (ex, '1s')
         """
         assert callable(func), 'func should be callable'
         self.__events = []
+        self.__distances = []
         self.__event_name = name
         for avatar in self.__parent.avatars:
             boolean_series = func(avatar)
             assert isinstance(boolean_series, pd.Series), 'func should return pd.Series of boolean with index'
             assert boolean_series.dtype == bool, 'dtype of boolean_series should be bool'
-            events = self.split_boolean_series(boolean_series)
-            filtered_events = []
-            for arr in events:
-                if len(arr)<length:
-                    continue
-                else:
-                    while len(arr)>=length:
-                        filtered_events.append(arr[:length])
-                        arr = arr[length:]
+            filtered_events = Intervals.from_boolean(boolean_series.values).split(avatar.get_window(length))
             if verbos==1:
                 print(f'Total {len(filtered_events)} event was detected', end='\r')
             if verbos==2:
@@ -106,13 +149,71 @@ class SearchEvent:
             self.__events.append(filtered_events)
         return self
 
+    def motif(self, query, name, features=['velocity'], k=10, exclusion=None, max_distance=None, verbos=1):
+        """Search events similar to query window (ex, example grooming bout) over all avatars.
+        Z-normalized distances to every window are computed by FFT (see Core.get_distance_profile)
+        and top k matches over all avatars become events.
+
+        :param query: (avatar, slice) of query frame positions, or array (frames x columns) of given features
+        :param features: list of feature names compared, columns of all features are used together
+        :param k: (int) number of matches over all avatars
+        :param exclusion: (int|str) minimum distance between starts of matches in same avatar (default and minimum: query length)
+        :param max_distance: if provided, matches farther than max_distance are dropped
+        """
+        if isinstance(query, tuple):
+            query_avatar, query_slice = query
+            query = self.get_feature_array(query_avatar, features)[query_slice]
+        else:
+            query_avatar, query_slice = None, None
+        query = np.asarray(query)
+        m = len(query)
+
+        self.__event_name = name
+        matches = []
+        for i, avatar in enumerate(self.__parent.avatars):
+            zone = max(m, avatar.get_window(exclusion) if exclusion else m) # frames at frame rate of each avatar
+            distance = avatar.get_distance_profile(query, self.get_feature_array(avatar, features))
+            if avatar is query_avatar: # query itself is trivial match
+                start = range(len(distance))[query_slice][0]
+                distance[max(0, start-zone+1):start+zone] = np.inf
+            positions = avatar.get_top_matches(distance, k, zone)
+            matches.extend((distance[p], i, p) for p in positions)
+        matches = sorted(matches)[:k]
+        if max_distance is not None:
+            matches = [match for match in matches if match[0] <= max_distance]
+
+        self.__events, self.__distances = [], []
+        for i, avatar in enumerate(self.__parent.avatars):
+            found = sorted((p, d) for d, j, p in matches if j == i)
+            starts = np.array([p for p, _ in found], dtype=np.int64)
+            self.__events.append(Intervals(starts, starts+m))
+            self.__distances.append(np.array([d for _, d in found]))
+        if verbos==1:
+            print(f'Total {len(matches)} event was detected', end='\r')
+        if verbos==2:
+            print(f'Total {len(matches)} event was detected')
+        return self
+
+    @staticmethod
+    def get_feature_array(avatar, features):
+        """Returns array (frames x columns) of concatenated features of avatar"""
+        return np.concatenate([avatar[feature].values for feature in features], axis=1)
+
+    @property
+    def events(self):
+        """List of event intervals (frame positions) of each avatar"""
+        return self.__events
+
+    @property
+    def distances(self):
+        """List of motif distances of events of each avatar (empty if events are not from motif)"""
+        return self.__distances
+
     @staticmethod
     def split_boolean_series(boolean_series):
-        indices, boolean = boolean_series.index, boolean_series.values
-        pos = np.nonzero(boolean[1:] != boolean[:-1])[0] + 1
-        arrs = np.split(indices, pos)
-        arrs = arrs[0::2] if boolean[0] else arrs[1::2]
-        return arrs
+        """Returns list of index label arrays of True runs of boolean_series. See also Intervals.from_boolean"""
+        indices = boolean_series.index
+        return [indices[s] for s in Intervals.from_boolean(boolean_series.values)]
 
     def describe(self, include=['corr', 'stat'], assign_ID=True, assign_tags=True, assign_event_name=True):
         describes = []
@@ -1,14 +1,17 @@
 from avatarpy.core import Core
 from avatarpy.transform import Transform
-from avatarpy.animate import Animate
 from avatarpy.describe import Describe
 from avatarpy.annotation import Annotation
+from avatarpy.spatial import Spatial
+from avatarpy.preprocess import Preprocess
+from avatarpy.spectral import Spectral
+from avatarpy.window import FeatureWindows
+from avatarpy.recording import Recording
 
 
 import numpy as np
 import pandas as pd
 from itertools import combinations
-from scipy.stats import zscore
 
 class Avatar(Core):
     _nodes={
@@ -47,27 +50,104 @@ class Avatar(Core):
         'rleg':{'left':'rleg', 'right':'hbody'},
     }
 
-    def __init__(self, csv_path, frame_rate=20, ID=None, tags={}, horizontal_correction=True):
+    def __init__(self, csv_path, frame_rate=20, ID=None, tags={}, horizontal_correction=True, lazy=False, dtype=np.float64, data=None, resample_rate=None, time_range=None):
+        r"""Avatar of single recording (header-less csv or binary .ava recording, see Recording)
+
+        :param lazy: if True, only path and metadata are recorded. Coordinates are loaded (and leveled) on first access
+        :param dtype: {np.float64(default)|np.float32} dtype of coordinates and derived features
+        :param data: (pd.DataFrame) coordinates indexed by frame number, used instead of reading csv_path
+        :param resample_rate: if provided, coordinates recorded at frame_rate are resampled to this frame rate on load (before leveling)
+        :param time_range: (start, stop) seconds of .ava recording to be loaded (memory-mapped random access)
+        """
         self._csv_path = csv_path
-        self._data = pd.read_csv(csv_path, header=None)
-        self._frame_rate = frame_rate
-        if frame_rate: self.data.index/=frame_rate
+        self._recording = None
+        self._time_range = time_range if time_range else (None, None)
+        if data is None and isinstance(csv_path, str) and csv_path.lower().endswith(Recording.extension):
+            # frame rate, ID and tags stored in recording header are used
+            self._recording = Recording(csv_path)
+            frame_rate = self._recording.frame_rate
+            ID = ID if ID else self._recording.ID
+            tags = tags if tags else self._recording.tags
+            horizontal_correction = horizontal_correction and not self._recording.leveled
+        self._data = None
+        self._source = data
+        self._reloadable = data is None
+        self._frame_rate = resample_rate if resample_rate else frame_rate
+        self._source_frame_rate = frame_rate
         self._ID=ID if ID else self.csv_path
         self._tags = tags
+        self._cache = {}
+        self._horizontal_correction = horizontal_correction
+        self._leveled = bool(self._recording.leveled) if self._recording is not None else False # whether coords are leveled
+        self._dtype = np.dtype(dtype)
+
+        self._transform = None
+        self._animate = None
+        self._describe = None
+        self._annotation = None
+        self._spatial = None
+        self._preprocess = None
+        self._spectral = None
+        self._shared = None
+        self._valid = None
+        # self._human_annotation = HumanAnnotation(parent=self)
+        # self._heuristic_annotation = HeuristicAnnotation(parent=self)
+
+        if not lazy:
+            self.load()
+
+    def __getattr__(self, name):
+        # node and vector attributes of lazy avatar are set by load on first access
+        if not name.startswith('_') and (name in self._nodes or name in self._vectors) and self.__dict__.get('_data') is None:
+            self.load()
+            return getattr(self, name)
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    def load(self):
+        """Loads coordinates, sets nodes and vectors and levels avatar. Does nothing if already loaded"""
+        if self.loaded:
+            return self
+        if self._source is not None:
+            data = self._source.astype(self.dtype, copy=False)
+            data = pd.DataFrame(data.values, index=data.index, columns=data.columns)
+            self._source = None
+        elif self._recording is not None:
+            data = self._recording.read(*self._time_range, dtype=self.dtype)
+        else:
+            data = pd.read_csv(self.csv_path, header=None, dtype=self.dtype)
+        if self._source_frame_rate: data.index/=self._source_frame_rate
+        if self._source_frame_rate and self.frame_rate != self._source_frame_rate:
+            values = self.resample_array(data.values, self._source_frame_rate, self.frame_rate).astype(self.dtype)
+            start = data.index[0] if len(data.index) else 0
+            data = pd.DataFrame(values, index=start+np.arange(len(values))/self.frame_rate, columns=data.columns)
+        self._data = data
         self.set_nodes()
         self.set_vectors()
+        if self._recording is not None and self._recording.header['annotations']:
+            labels = self._recording.read_annotation(*self._time_range)
+            if self._source_frame_rate: labels.index/=self._source_frame_rate
+            self.annotation.update(labels.reindex(data.index, method='nearest'))
 
-        self._transform = Transform(parent=self)
-        self._animate = Animate(parent=self)
-        self._describe = Describe(parent=self)
-        self._annotation = Annotation(parent=self)
-        # self._human_annotation = HumanAnnotation(parent=self)
-        # self._heuristic_annotation = HeuristicAnnotation(parent=self)
-        
-        if horizontal_correction:
+        if self._horizontal_correction:
             self.data = self.transform.level().data
             self.set_nodes()
             self.set_vectors()
+            self._leveled = True
+        return self
+
+    def unload(self):
+        """Releases coordinates, nodes, vectors and cached features. Avatar is loaded again from file on next access"""
+        assert self._reloadable, 'avatar built from data cannot be reloaded'
+        self._data = None
+        self._cache = {}
+        for name in list(self._nodes)+list(self._vectors):
+            self.__dict__.pop(name, None)
+        return self
+
+    @property
+    def loaded(self):
+        """Whether coordinates are loaded"""
+        return self._data is not None
 
     @property
     def csv_path(self):
@@ -79,10 +159,13 @@ class Avatar(Core):
     @property
     def data(self):
         """Raw data of repeated x, y, z coordinates of nodes"""
+        if self._data is None:
+            self.load()
         return self._data
     @data.setter
     def data(self, v):
         self._data = v
+        self._cache = {}
     @property
     def frame_rate(self):
         """Number of frames recorded in 1 second. (a.k.a. data rate, sampling rate)"""
@@ -91,6 +174,10 @@ class Avatar(Core):
     def frame_rate(self, v):
         self._frame_rate = v
     @property
+    def dtype(self):
+        """dtype of coordinates and derived features (np.float32 halves memory)"""
+        return self._dtype
+    @property
     def ID(self):
         """User provided ID for avatar instance. (default: csv_path)"""
         return self._ID
@@ -128,6 +215,7 @@ class Avatar(Core):
             
     def set_nodes(self):
         """Set node attributes in avatar with predefined node info in `cls._nodes`"""
+        self._cache = {}
         for name, cols in self._nodes.items():
             data = self.get_node(cols)
             setattr(self, name, data)
@@ -138,6 +226,44 @@ class Avatar(Core):
             data = self.get_vector(self[labels['head']], self[labels['tail']])
             setattr(self, name, data)
             
+    def __getitem__(self, item):
+        # features placed in shared memory (see share) are served without recomputation
+        key = ('feature', item)
+        if key in self._cache:
+            return self._cache[key]
+        return getattr(self, item)
+
+    def get_cached(self, key, func):
+        """Returns cached value of key, computed by func() on first call. Cache is cleared when nodes are set"""
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    @property
+    def node_tensor(self):
+        """Numpy 3d array (N x nodes x 3) of all nodes coords"""
+        columns = np.array(list(self._nodes.values()))
+        return self.get_cached('node_tensor', lambda: self.data.values[:, columns])
+
+    @property
+    def vector_tensor(self):
+        """Numpy 3d array (N x vectors x 3) of all vectors coords"""
+        names = list(self._nodes.keys())
+        head = [names.index(v['head']) for v in self._vectors.values()]
+        tail = [names.index(v['tail']) for v in self._vectors.values()]
+        return self.get_cached('vector_tensor', lambda: self.node_tensor[:, head]-self.node_tensor[:, tail])
+
+    @property
+    def vector_norm(self):
+        """Numpy 2d array (N x vectors) of length of all vectors"""
+        return self.get_cached('vector_norm', lambda: self.get_distance(self.vector_tensor))
+
+    @property
+    def angle_index(self):
+        """Numpy 2d array (angles x 2) of left, right vector positions of predefined angles in vector_tensor"""
+        names = list(self._vectors.keys())
+        return np.array([[names.index(v['left']), names.index(v['right'])] for v in self._angles.values()]).reshape(-1, 2)
+
     @property
     def index(self):
         """Index of recording timecourse. If frame rate is provided, unit is second"""
@@ -200,17 +326,17 @@ class Avatar(Core):
 
     @property
     def unit_vector_x(self):
-        """Numpy 2d array (N x 3) of x unit vector [1,0,0]"""
+        """Numpy 2d array (N x 3) of x unit vector (read-only broadcast view) [1,0,0]"""
         return self.get_unit_vector(axis='x')
 
     @property
     def unit_vector_y(self):
-        """Numpy 2d array (N x 3) of y unit vector [0,1,0]"""
+        """Numpy 2d array (N x 3) of y unit vector (read-only broadcast view) [0,1,0]"""
         return self.get_unit_vector(axis='y')
 
     @property
     def unit_vector_z(self):
-        """Numpy 2d array (N x 3) of z unit vector. [0,0,1]"""
+        """Numpy 2d array (N x 3) of z unit vector (read-only broadcast view). [0,0,1]"""
         return self.get_unit_vector(axis='z')
 
     @property
@@ -224,11 +350,11 @@ class Avatar(Core):
         return pd.concat(labeled_data).sort_index()
 
     def get_unit_vector(self, axis):
-        """Returns numpy 2d array (N x 3) of given axis unit vector"""
+        """Returns numpy 2d array (N x 3) of given axis unit vector. Broadcast view of single vector without copies"""
         if axis=='x': arr = np.array([1,0,0])
         elif axis=='y': arr = np.array([0,1,0])
-        elif axis=='z': arr = np.array([0,1,0])
-        return np.stack([arr]*len(self.index))
+        elif axis=='z': arr = np.array([0,0,1])
+        return np.broadcast_to(arr, (len(self.index), 3))
     
     def get_node(self, columns):
         """Returns T-series node x, y, z coords by assigned index of columns"""
@@ -261,14 +387,31 @@ class Avatar(Core):
         return pd.DataFrame([self.get_triangular_area_by_nodes(*c) for c in nodes_combinations]).T
 
 
+    def get_angles(self):
+        """Returns numpy 2d array (N x angles) of predefined angles by single gather over vector_tensor"""
+        left, right = self.angle_index.T
+        vectors, norms = self.vector_tensor, self.vector_norm
+        dot = self.get_dot_product(vectors[:, left], vectors[:, right])
+        return np.arccos(dot/(norms[:, left]*norms[:, right]))
+
     @property
     def angle(self):
         """Returns T-series angles between predefined two vectors"""
-        data_dict = {}
-        for name, vectors in self._angles.items():
-            data_dict[name]=self.get_angle(self[vectors['left']], self[vectors['right']])
-        return pd.DataFrame(data_dict).set_index(self.data.index)
-    
+        data = self.get_cached('angle', self.get_angles)
+        return pd.DataFrame(data, index=self.data.index, columns=list(self._angles.keys()), copy=True)
+
+    @property
+    def signed_angle(self):
+        """Returns T-series signed angles between predefined two vectors, signed relative to body plane
+        (vertical plane through nose2anus). Positive if counterclockwise seen from left side of animal
+        """
+        left, right = self.angle_index.T
+        vectors = self.vector_tensor
+        # lateral normal of body plane, pointing to left side of animal
+        normal = self.get_cross_product(self.nose2anus.values, np.array([0, 0, 1]))[:, np.newaxis]
+        data = self.get_signed_angle(vectors[:, left], vectors[:, right], normal)
+        return pd.DataFrame(data, index=self.data.index, columns=list(self._angles.keys()))
+
     @property
     def angle_velocity(self):
         """Returns T-series angles velocity between predefined two vectors"""
@@ -282,14 +425,12 @@ class Avatar(Core):
     @property
     def vector_length(self):
         """Returns length of all vectors"""
-        data_dict = {}
-        for name, vector in self.vectors.items():
-            data_dict[name]=self.get_distance(vector)
-        return pd.DataFrame(data_dict).set_index(self.data.index)
+        return pd.DataFrame(self.vector_norm, index=self.data.index, columns=list(self._vectors.keys()), copy=True)
 
     @property
     def stretch_index(self):
         """Returns stretch_index which is equal to zscore of vector length"""
+        from scipy.stats import zscore
         return self.vector_length.apply(zscore)
     
     @property
@@ -330,10 +471,37 @@ class Avatar(Core):
     
     def get_projection(self, vector, to):
         """Project 3D coordinates on to axis or plane"""
-        zero_axis = list(set('xyz')-set(to))
-        kwargs = {axis:0 for axis in zero_axis}
-        return vector.assign(**kwargs)
-    
+        mask = np.array([axis in to for axis in 'xyz'])
+        return vector*mask
+
+    def get_projections(self, to, nodes=None):
+        """Returns numpy 3d array (N x nodes x 3) of nodes coords projected on to axis or plane by single array operation
+
+        :param to: {'x'|'y'|'z'|'xy'|'yz'|'xz'}
+        :param nodes: list of node names. If None, all nodes
+        """
+        mask = np.array([axis in to for axis in 'xyz'])
+        return self.get_node_tensor(nodes)*mask
+
+    def get_axis_projections(self, axis, nodes=None):
+        """Returns numpy 3d array (N x nodes x 3) of nodes coords projected on to axis vector (3 or N x 3)"""
+        axis = np.asarray(axis, dtype=float)
+        axis = axis/np.linalg.norm(axis, axis=-1, keepdims=True)
+        axis = axis[..., np.newaxis, :]
+        tensor = self.get_node_tensor(nodes)
+        return self.get_dot_product(tensor, axis)[..., np.newaxis]*axis
+
+    def get_plane_projections(self, normal, nodes=None):
+        """Returns numpy 3d array (N x nodes x 3) of nodes coords projected on to plane of normal vector (3 or N x 3)"""
+        return self.get_node_tensor(nodes)-self.get_axis_projections(normal, nodes)
+
+    def get_node_tensor(self, nodes=None):
+        """Returns numpy 3d array (N x nodes x 3) of given node names. If None, all nodes"""
+        if nodes is None:
+            return self.node_tensor
+        names = list(self._nodes.keys())
+        return self.node_tensor[:, [names.index(node) for node in nodes]]
+
     def x_projection(self, node): 
         """Project 3D coordinates on to x axis"""
         return self.get_projection(vector=self[node], to='x')
@@ -361,34 +529,78 @@ class Avatar(Core):
     @property
     def transform(self):
         """Transform module for coordinate change"""
+        if self._transform is None:
+            self._transform = Transform(parent=self)
         return self._transform
     
     @property
     def animate(self):
         """Animation module for coordinate change"""
+        if self._animate is None:
+            from avatarpy.animate import Animate
+            self._animate = Animate(parent=self)
         return self._animate
 
     @property
     def describe(self):
         """Feature Extract module for coordinate change"""
+        if self._describe is None:
+            self._describe = Describe(parent=self)
         return self._describe
 
     @property
     def annotation(self):
         """Annotation module for behavior screening"""
+        if self._annotation is None:
+            self._annotation = Annotation(parent=self)
         return self._annotation
 
+    @property
+    def preprocess(self):
+        """Preprocess module for gap interpolation and outlier filtering"""
+        if self._preprocess is None:
+            self._preprocess = Preprocess(parent=self)
+        return self._preprocess
+
+    @property
+    def valid(self):
+        """Validity mask (N x nodes) of coords. After preprocess.clean, interpolated coords are False"""
+        if self._valid is None:
+            return self.preprocess.get_validity()
+        return self._valid
+
+    @property
+    def spatial(self):
+        """Spatial module for region of interest and proximity queries"""
+        if self._spatial is None:
+            self._spatial = Spatial(parent=self)
+        return self._spatial
+
+    @property
+    def spectral(self):
+        """Spectral module for frequency-domain features (PSD, spectrogram, band power)"""
+        if self._spectral is None:
+            self._spectral = Spectral(parent=self)
+        return self._spectral
+
+    def get_window(self, window):
+        """Returns window size in frames. Window can be given in frames (int) or seconds (str, ex '1.5s')"""
+        if isinstance(window, str):
+            assert window.endswith('s') and self.frame_rate, "window in seconds should end with 's' and requires frame_rate"
+            return max(1, int(round(float(window[:-1])*self.frame_rate)))
+        return window
+
     def corr(self, data, window=None, center=True, **kwargs):
         """Returns rolling correlation with given property of data
         
         :param data: (str|pd.DataFrame)
-        :param window: (int|None) if provided rolling corr is provided
+        :param window: (int|str|None) if provided rolling corr is provided. int is frames, str is seconds (ex, '1s')
         """
         if isinstance(data, str):
             data = self[data]
         if window==None:
             return self.flatten_pairwise_df(data.corr())
-        return self.get_rolling_corr(data, window, center, **kwargs)
+        return self.get_rolling_corr(data, self.get_window(window), center, **kwargs)
 
     def xcorr_lag(self, data, flatten=True):
         """Returns cross correlation time lag by parwise column calculation. See also xcorr_max
@@ -425,6 +637,32 @@ class Avatar(Core):
             df.columns = df.columns.map('_'.join)
         return df
 
+    def save(self, path):
+        """Saves avatar as binary recording (.ava): float32 coords, skeleton schema, frame_rate, ID, tags and annotations.
+        Saved recording is loaded by Avatar(path) without csv parsing. Returns path
+        """
+        return Recording.write(path, self)
+
+    def share(self, features=[], backend=None, directory=None):
+        """Places coords, given features and annotation in shared memory (or memory-mapped files), and returns
+        picklable handle. Workers rebuild avatar by handle.attach() without copying. Owner should call handle.unlink() when done
+
+        :param features: list of feature names computed once and shared (ex, ['velocity', 'angle'])
+        :param backend: {None(default)|'shm'|'memmap'} see SharedAvatar
+        """
+        from avatarpy.shared import SharedAvatar
+        return SharedAvatar.create(self, features=features, backend=backend, directory=directory)
+
+    def gather_windows(self, window=20, stride=1, batch_size=1024, features=['x', 'y', 'z', 'aop_x', 'aop_y', 'aop_z', 'aoa_x', 'aoa_y', 'aoa_z', 'velocity', 'acceleration', 'angle', 'angle_velocity', 'angle_acceleration', 'stretch_index', 'area'], flatten=False, dropna=False):
+        """Returns iterable of fixed-size feature windows batches without building wide dataframe. See also gather
+
+        :param window: (int|str) window size, int is frames, str is seconds (ex, '1s')
+        :param stride: (int|str) frames between window starts, int is frames, str is seconds
+
+        :returns: FeatureWindows, yields (starts, batch) and keeps column index in `columns`
+        """
+        return FeatureWindows(self, features, window=self.get_window(window), stride=self.get_window(stride), batch_size=batch_size, flatten=flatten, dropna=dropna)
+
     def aop(self, *args, **kwargs):
         """Transforms avatar coords. Align on plane.
         """
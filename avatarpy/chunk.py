@@ -0,0 +1,153 @@
+import os
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+from avatarpy.core import Core
+from avatarpy.avatar import Avatar
+
+class ChunkedAvatar(Core):
+    def __init__(self, csv_path, chunksize=72000, overlap=40, frame_rate=20, ID=None, tags={}, horizontal_correction=True, dtype=np.float64):
+        r"""Out-of-core avatar processing a long recording in overlapping chunks
+
+        Each chunk is an Avatar of `chunksize` frames padded with `overlap` frames of its neighbours on both sides,
+        so diff-based (velocity, acceleration) and centered rolling features are correct at chunk boundaries
+        as long as overlap is larger than their lookback/lookahead (ex, window//2 of rolling corr).
+        Features normalized over the recording (stretch_index) are normalized per chunk.
+
+        :param chunksize: (int) number of frames in a chunk
+        :param overlap: (int) number of neighbouring frames padded on each side of chunk
+        :param horizontal_correction: if True, chunks are leveled with floor slope regressed over whole recording
+        """
+        assert overlap <= chunksize, 'overlap should not be larger than chunksize'
+        self._csv_path = csv_path
+        self.chunksize = chunksize
+        self.overlap = overlap
+        self.frame_rate = frame_rate
+        self.ID = ID if ID else csv_path
+        self.tags = tags
+        self.horizontal_correction = horizontal_correction
+        self.dtype = np.dtype(dtype)
+        self._level_coef = None
+
+    def __repr__(self):
+        return f'ChunkedAvatar({self.ID})'
+
+    @property
+    def csv_path(self):
+        """Original coordinates file path"""
+        return self._csv_path
+
+    def read(self):
+        """Returns iterator of raw coordinates chunks indexed by frame number"""
+        return pd.read_csv(self.csv_path, header=None, dtype=self.dtype, chunksize=self.chunksize)
+
+    @property
+    def level_coef(self):
+        """Floor slope (a, b) regressed on lfoot and rfoot nodes of whole recording by streaming normal equations"""
+        if self._level_coef is None:
+            XtX, Xtz = np.zeros((3, 3)), np.zeros(3)
+            for chunk in self.read():
+                for node in ['lfoot', 'rfoot']:
+                    coords = chunk[Avatar._nodes[node]].values.astype(np.float64)
+                    x, y, z = coords[np.isfinite(coords).all(axis=1)].T
+                    X = np.column_stack([x, y, np.ones(len(x))])
+                    XtX += X.T @ X
+                    Xtz += X.T @ z
+            a, b, _ = np.linalg.solve(XtX, Xtz)
+            self._level_coef = (a, b)
+        return self._level_coef
+
+    def __iter__(self):
+        """Yields (avatar, core) of each chunk where core is slice of chunk's own frames in avatar"""
+        coef = self.level_coef if self.horizontal_correction else None
+        reader = iter(self.read())
+        head, current = None, next(reader, None)
+        while current is not None:
+            following = next(reader, None)
+            tail = following.iloc[:self.overlap] if following is not None and self.overlap else None
+            data = pd.concat([d for d in [head, current, tail] if d is not None])
+            start = 0 if head is None else len(head)
+            avatar = Avatar(self.csv_path, frame_rate=self.frame_rate, ID=self.ID, tags=self.tags,
+                horizontal_correction=False, dtype=self.dtype, data=data)
+            if coef is not None:
+                avatar = avatar.transform.level(coef)
+            yield avatar, slice(start, start+len(current))
+            head = current.iloc[len(current)-self.overlap:] if self.overlap else None
+            current = following
+
+    @staticmethod
+    def get_core(df, avatar, core):
+        """Returns rows of df within core frames of chunk avatar. Rows dropped by df (ex, all-NaN rolling corr) are kept dropped"""
+        if len(df) == len(avatar.index):
+            return df.iloc[core]
+        return df[df.index.isin(avatar.index[core])]
+
+    def apply(self, func, out_dir):
+        """Applies func to each chunk avatar and streams core rows of results to disk
+
+        :param func: callable returning pd.DataFrame indexed by avatar index (ex, lambda avatar: avatar.gather())
+        :param out_dir: directory to write <chunk>.npy (column-major) and columns.json
+
+        :returns: list of written .npy paths
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths, index_paths = [], []
+        for i, (avatar, core) in enumerate(self):
+            df = self.get_core(func(avatar), avatar, core)
+            path = os.path.join(out_dir, f'{i:05d}.npy')
+            np.save(path, np.asfortranarray(df.values))
+            paths.append(path)
+            index_path = os.path.join(out_dir, f'{i:05d}.index.npy')
+            np.save(index_path, df.index.values)
+            index_paths.append(index_path)
+        with open(os.path.join(out_dir, 'columns.json'), 'w') as f:
+            json.dump(dict(columns=[str(c) if not isinstance(c, tuple) else '_'.join(c) for c in df.columns],
+                chunks=paths, indices=index_paths), f)
+        return paths
+
+    @staticmethod
+    def load(out_dir, mmap_mode='r'):
+        """Returns pd.DataFrame of results streamed by apply. Chunks are memory-mapped before concatenation"""
+        with open(os.path.join(out_dir, 'columns.json')) as f:
+            meta = json.load(f)
+        data = np.concatenate([np.load(p, mmap_mode=mmap_mode) for p in meta['chunks']])
+        index = np.concatenate([np.load(p) for p in meta['indices']])
+        return pd.DataFrame(data, index=index, columns=meta['columns'])
+
+    def stat(self, features=['velocity', 'acceleration', 'angle', 'angle_velocity', 'angle_acceleration', 'vector_length'],
+        out_dir=None, assign_ID=True, assign_tags=True):
+        """Returns basic stat (mean, std, cv, median, skew, kurtosis) of given features merged from per-chunk results.
+        Same format as Describe.stat. Per-chunk features are streamed to out_dir (temporary directory if None) for median.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_dir = out_dir if out_dir else tmp_dir
+            moments, paths, columns = {}, {}, {}
+            for i, (avatar, core) in enumerate(self):
+                for feature in features:
+                    df = self.get_core(avatar[feature], avatar, core)
+                    m = self.get_moments(df.values)
+                    moments[feature] = self.merge_moments(moments[feature], m) if feature in moments else m
+                    os.makedirs(os.path.join(out_dir, feature), exist_ok=True)
+                    path = os.path.join(out_dir, feature, f'{i:05d}.npy')
+                    np.save(path, np.asfortranarray(df.values))
+                    paths.setdefault(feature, []).append(path)
+                    columns[feature] = df.columns
+
+            stats = []
+            for feature in features:
+                stat = self.moments_to_stat(moments[feature])
+                stat['cv'] = stat['mean']/stat['std']
+                chunks = [np.load(p, mmap_mode='r') for p in paths[feature]]
+                # column-major chunks, so each column is contiguous on disk
+                stat['median'] = np.array([np.nanmedian(np.concatenate([c[:, j] for c in chunks])) for j in range(len(columns[feature]))])
+                for name in ['mean', 'std', 'cv', 'median', 'skewness', 'kurtosis']:
+                    stats.append(pd.DataFrame(dict(target=columns[feature], value=stat[name])).assign(
+                        feature=feature, category='statistics', type=name))
+                del chunks
+        df = pd.concat(stats).reset_index(drop=True)
+        if assign_ID:
+            df = df.assign(ID=self.ID)
+        if assign_tags:
+            df = df.assign(**self.tags)
+        return df
@@ -0,0 +1,190 @@
+"""Command-line batch runner of avatarpy
+
+Loads every recording of a folder, extracts features, describes them and writes one pickled
+describe dataframe per session into the output directory. `manifest.json` in the output directory
+records source mtime/size, config hash, status and error of each session, so rerun only processes
+new, changed or failed sessions. A failing session is recorded and does not stop the others.
+
+usage: avatarpy <folder> -o <out_dir> [-c config.json] [-j workers] [--force] [--combine]
+
+config (json, all keys optional):
+    {
+        "frame_rate": 20, "resample_rate": null, "dtype": "float64",
+        "id_policy": "filepath", "tag_policy": "dirname", "tags": {},
+        "describe": {"corr": {}, "stat": {"features": ["velocity", "angle"]}, "spectral": {"nperseg": "2s"}},
+        "events": {"fast": {"func": "mymodule:is_fast", "length": "1s"}}
+    }
+`events` maps event name to importable "module:function" (returning boolean pd.Series of avatar) and
+event length (see SearchEvent). If events are given, sessions are described per event instead of whole recording.
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import importlib
+import traceback
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULT_CONFIG = dict(
+    frame_rate=20,
+    resample_rate=None,
+    dtype='float64',
+    id_policy='filepath',
+    tag_policy='dirname',
+    tags={},
+    describe={'corr':{}, 'stat':{}},
+    events={},
+)
+
+def load_config(path=None):
+    """Returns config dict of json file merged on DEFAULT_CONFIG"""
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path) as f:
+            user_config = json.load(f)
+        unknown = set(user_config)-set(DEFAULT_CONFIG)
+        assert not unknown, f'unknown config keys: {sorted(unknown)}'
+        config.update(user_config)
+    return config
+
+def get_config_hash(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+def import_func(spec):
+    """Returns function of "module:function" string"""
+    module, _, name = spec.partition(':')
+    assert name, f'event function should be given as "module:function", got {spec}'
+    return getattr(importlib.import_module(module), name)
+
+def get_output_path(out_dir, csv_path, root):
+    name = os.path.splitext(os.path.relpath(csv_path, root))[0].replace(os.sep, '__')
+    return os.path.join(out_dir, 'sessions', f'{name}.pkl')
+
+def process_session(csv_path, ID, tags, config, out_path):
+    """Loads avatar, describes it by config and writes describe dataframe to out_path. Runs in worker process"""
+    import numpy as np
+    import pandas as pd
+    from avatarpy import Avatar
+
+    avatar = Avatar(csv_path, frame_rate=config['frame_rate'], ID=ID, tags=tags,
+        dtype=np.dtype(config['dtype']), resample_rate=config['resample_rate'])
+    def describe(indices=None):
+        return pd.concat([getattr(avatar.describe, category)(indices=indices, **kwargs)
+            for category, kwargs in config['describe'].items()])
+    if config['events']:
+        describes = []
+        for name, event in config['events'].items():
+            event = event if isinstance(event, dict) else dict(func=event)
+            avatar.annotation.add(by=import_func(event['func']), name=name)
+            intervals = avatar.annotation.get_intervals(name)
+            if 'length' in event:
+                intervals = intervals.split(avatar.get_window(event['length']))
+            describes.extend(describe(indices).assign(event=name) for indices in intervals)
+        df = pd.concat(describes) if describes else pd.DataFrame()
+    else:
+        df = describe()
+    df = df.reset_index(drop=True)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path+'.tmp'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, out_path)
+    return len(df)
+
+class Manifest:
+    def __init__(self, out_dir):
+        r"""Session records of batch run stored in <out_dir>/manifest.json"""
+        self.path = os.path.join(out_dir, 'manifest.json')
+        self.sessions = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.sessions = json.load(f)['sessions']
+
+    def is_done(self, csv_path, stat, config_hash):
+        """Whether session was processed successfully from unchanged source with same config"""
+        record = self.sessions.get(csv_path)
+        return (record is not None and record['status'] == 'done' and record['mtime'] == stat.st_mtime
+            and record['size'] == stat.st_size and record['config'] == config_hash and os.path.exists(record['output']))
+
+    def update(self, csv_path, **record):
+        self.sessions[csv_path] = dict(self.sessions.get(csv_path, {}), **record, updated=str(datetime.now()))
+        self.save()
+
+    def save(self):
+        # written atomically after each session, so interrupted run can be resumed
+        tmp_path = self.path+'.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(sessions=self.sessions), f, indent=1)
+        os.replace(tmp_path, self.path)
+
+def run(root, out_dir, config, workers=1, force=False, verbose=1):
+    """Runs batch job over csv files of root. Returns manifest
+
+    :param workers: (int) number of worker processes. If 1, sessions run in current process
+    :param force: if True, all sessions are reprocessed
+    """
+    from avatarpy import AvaLens
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(out_dir)
+    config_hash = get_config_hash(config)
+    lens = AvaLens(id_policy=config['id_policy'], tag_policy=config['tag_policy'])
+    lens.add_folder(root, tags=config['tags'], verbose=0, lazy=True, frame_rate=config['frame_rate'])
+
+    jobs = []
+    for avatar in lens.avatars:
+        stat = os.stat(avatar.csv_path)
+        if not force and manifest.is_done(avatar.csv_path, stat, config_hash):
+            continue
+        out_path = get_output_path(out_dir, avatar.csv_path, root)
+        manifest.update(avatar.csv_path, output=out_path, mtime=stat.st_mtime, size=stat.st_size,
+            config=config_hash, status='pending', error=None)
+        jobs.append((avatar.csv_path, avatar.ID, avatar.tags, config, out_path))
+    if verbose:
+        print(f'[{datetime.now()}] {len(jobs)} of {len(lens.avatars)} sessions to process')
+
+    def record(csv_path, future_or_call):
+        try:
+            rows = future_or_call()
+            manifest.update(csv_path, status='done', rows=rows, error=None)
+        except Exception:
+            manifest.update(csv_path, status='failed', error=traceback.format_exc())
+        if verbose:
+            print(f"[{datetime.now()}] {manifest.sessions[csv_path]['status']}: {csv_path}")
+
+    if workers == 1:
+        for job in jobs:
+            record(job[0], lambda: process_session(*job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_session, *job):job[0] for job in jobs}
+            for future in as_completed(futures):
+                record(futures[future], future.result)
+    return manifest
+
+def combine(manifest):
+    """Returns concatenated describe dataframe of all done sessions of manifest"""
+    import pandas as pd
+    frames = [pd.read_pickle(record['output']) for record in manifest.sessions.values() if record['status'] == 'done']
+    return pd.concat(frames).reset_index(drop=True) if frames else pd.DataFrame()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='avatarpy', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help='folder searched recursively for csv recordings')
+    parser.add_argument('-o', '--out', required=True, help='output directory of session outputs and manifest.json')
+    parser.add_argument('-c', '--config', default=None, help='json config file')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='reprocess all sessions')
+    parser.add_argument('--combine', action='store_true', help='write describe of all done sessions to <out>/describe.pkl')
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    manifest = run(args.folder, args.out, config, workers=args.workers, force=args.force, verbose=0 if args.quiet else 1)
+    if args.combine:
+        combine(manifest).to_pickle(os.path.join(args.out, 'describe.pkl'))
+    failed = [path for path, record in manifest.sessions.items() if record['status'] == 'failed']
+    if failed:
+        print(f'{len(failed)} sessions failed. See errors in {manifest.path}', file=sys.stderr)
+    return 1 if failed else 0
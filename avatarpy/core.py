@@ -1,15 +1,15 @@
 import numpy as np
 import pandas as pd
-from scipy.signal import correlate
+from functools import lru_cache
 
 class Core:   
     def __getitem__(self, item):
         return getattr(self, item)
         
     def get_dot_product(self, vector1, vector2):
-        r"""Calculates dot product of two T-series vectors (Nx3)
+        r"""Calculates dot product of two T-series vectors (Nx3 or N x ... x 3)
         """
-        return np.einsum('ij,ij->i', vector1, vector2)
+        return np.einsum('...i,...i->...', vector1, vector2)
         
     def get_cross_product(self, vector1, vector2):
         r"""Calculates cross product of two T-series vectors (Nx3)
@@ -28,6 +28,13 @@ class Core:
         denominator = self.get_distance(vector1)*self.get_distance(vector2)
         return np.arccos(numerator/denominator)
     
+    def get_signed_angle(self, vector1, vector2, normal):
+        r"""Calculates signed angle (-pi~pi) of T-series vectors (N x ... x 3), signed by normal vector (3 or N x ... x 3).
+        Positive if vector1 to vector2 is counterclockwise seen from normal
+        """
+        sign = np.sign(self.get_dot_product(self.get_cross_product(vector1, vector2), normal))
+        return sign*self.get_angle(vector1, vector2)
+
     def get_triangular_area_by_vectors(self, vector1, vector2):
         r"""Calcultes triangular area of T-series vector (Nx3)
         """
@@ -48,8 +55,8 @@ class Core:
         N = v.shape[0]
         s = self.get_distance(v) # sine of angle
         c = self.get_dot_product(unit_vector_a, unit_vector_b) # cos of angle
-        I = np.stack([np.eye(3)]*N)
-        vx = np.zeros((N, 3, 3))
+        I = np.eye(3, dtype=v.dtype) # broadcasts over N
+        vx = np.zeros((N, 3, 3), dtype=v.dtype)
         vx[:, 2, 1]= v[:, 0]
         vx[:, 1, 2]= -v[:, 0]
         vx[:, 0, 2]= v[:, 1]
@@ -78,7 +85,7 @@ class Core:
         n = len(angles)
         s = np.cos(angles)
         c = np.sin(angles)
-        R = np.zeros([n, 3, 3])
+        R = np.zeros([n, 3, 3], dtype=np.result_type(angles, np.float32))
         R[:, 0, 0]=1
         R[:, 1, 1]=c
         R[:, 1, 2]=-s
@@ -92,7 +99,7 @@ class Core:
         n = len(angles)
         s = np.cos(angles)
         c = np.sin(angles)
-        R = np.zeros([n, 3, 3])
+        R = np.zeros([n, 3, 3], dtype=np.result_type(angles, np.float32))
         R[:, 1, 1]=1
         R[:, 0, 0]=c
         R[:, 0, 2]=-s
@@ -106,7 +113,7 @@ class Core:
         n = len(angles)
         s = np.cos(angles)
         c = np.sin(angles)
-        R = np.zeros([n, 3, 3])
+        R = np.zeros([n, 3, 3], dtype=np.result_type(angles, np.float32))
         R[:, 2, 2]=1
         R[:, 0, 0]=c
         R[:, 0, 1]=-s
@@ -118,13 +125,68 @@ class Core:
         r"""Flatten the pairwise symmetric df
         """
         if diagonal_only:
-            mask = np.tril(np.ones(df.shape).astype(np.bool))
-            s = df.mask(mask).stack()
+            I, J, labels = self.get_upper_pair_labels(tuple(df.columns))
+            s = pd.Series(df.values[I, J], index=labels)
+            return s[s.notna()]
         else:
             s = df.stack()
         s.index = s.index.map(lambda x: '_'.join(x[-2:]))
         return s
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def get_upper_pair_labels(columns):
+        r"""Returns (I, J, labels) of upper triangle column pairs (i<j). Cached per column set
+
+        :params columns: tuple of column names
+        """
+        I, J = np.triu_indices(len(columns), k=1)
+        labels = pd.Index([f'{columns[i]}_{columns[j]}' for i, j in zip(I, J)])
+        return I, J, labels
+
+    def batch_corr(self, df, method='pearson', frame_rate=None, max_elements=2**24):
+        r"""Returns correlation, xcorr max and xcorr lag of all upper triangle column pairs from one standardized array.
+        Equal to flattened df.corr(method), xcorr_max and xcorr_lag (see xcorr) when NaN rows are shared by all columns.
+        Cross correlations of all pairs are computed by FFT in batches of at most max_elements values
+
+        :params method: {'pearson'(default)|'spearman'}
+        :params frame_rate: if provided, lag is in seconds
+        :returns: pd.DataFrame (pairs x [method, 'xcorr_max', 'xcorr_lag']) (all NaN if no finite rows), or None if columns have different NaN rows
+        """
+        X = df.to_numpy(dtype=np.float64)
+        finite = np.isfinite(X)
+        valid = finite.all(axis=1)
+        if (finite.any(axis=1) & ~valid).any():
+            return None
+        X = X[valid]
+        n = len(X)
+        I, J, labels = self.get_upper_pair_labels(tuple(df.columns))
+        if n < 1: # no finite rows (ex, empty selection), same as pairwise path
+            return pd.DataFrame(np.nan, index=labels, columns=[method, 'xcorr_max', 'xcorr_lag'])
+
+        def standardize(x):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return (x-x.mean(axis=0))/x.std(axis=0)
+        Z = standardize(X)
+        R = standardize(pd.DataFrame(X).rank().to_numpy()) if method == 'spearman' else Z
+        corr = np.clip((R.T @ R)[I, J]/n, -1, 1)
+
+        nfft = 1 << int(np.ceil(np.log2(max(2*n-1, 1))))
+        F = np.fft.rfft(Z, nfft, axis=0)
+        lags = np.arange(-n+1, n)
+        xmax, xlag = np.empty(len(I)), np.empty(len(I))
+        step = max(1, max_elements//nfft)
+        for k in range(0, len(I), step):
+            i, j = I[k:k+step], J[k:k+step]
+            cc = np.fft.irfft(F[:, i]*np.conj(F[:, j]), nfft, axis=0)
+            full = np.concatenate([cc[nfft-n+1:], cc[:n]]) # lags -(n-1) ... n-1
+            with np.errstate(invalid='ignore', divide='ignore'):
+                xmax[k:k+step] = np.clip(full.max(axis=0)/(len(full)-1), -1, 1)
+            xlag[k:k+step] = lags[full.argmax(axis=0)]
+        if frame_rate:
+            xlag = xlag/frame_rate
+        return pd.DataFrame({method:corr, 'xcorr_max':xmax, 'xcorr_lag':xlag}, index=labels)
+
     def get_rolling_corr(self, df, window=20, center=True, **kwargs):
         r"""Returns flattened rolling correlations.
         """
@@ -140,6 +202,8 @@ class Core:
         :params normalize: bool
         :returns: dict['lags', 'corr', 'corr_max', 'lag']
         """
+        from scipy.signal import correlate
+
         def inval(x):
             if isinstance(x, pd.Series): 
                 x = x.to_numpy()
@@ -161,6 +225,37 @@ class Core:
         max_corr = np.clip(corr.max(), -1, 1)
         return dict(lags=lags, corr=corr, max=max_corr, lag=lag)
 
+    @staticmethod
+    def resample_array(arr, frame_rate, new_frame_rate, method='poly'):
+        r"""Resamples T-series array (N x ...) along first axis at once for all columns
+
+        :params method: {'poly'(default)|'interp'} 'poly' is polyphase filtering with anti-aliasing FIR filter
+            (decimation and upsampling by rational factor), 'interp' is linear interpolation
+        :returns: resampled array
+        """
+        from fractions import Fraction
+
+        if method == 'poly':
+            from scipy.signal import resample_poly
+            ratio = Fraction(new_frame_rate).limit_denominator(1000)/Fraction(frame_rate).limit_denominator(1000)
+            invalid = ~np.isfinite(arr)
+            if not invalid.any():
+                return resample_poly(arr, ratio.numerator, ratio.denominator, axis=0, padtype='line')
+            # gaps are interpolated before filtering, so single dropout does not spread over whole FIR length,
+            # then re-masked at output frames whose nearest input frame was invalid
+            filled = pd.DataFrame(arr.reshape(len(arr), -1)).interpolate(limit_direction='both').fillna(0).values.reshape(arr.shape)
+            ret = resample_poly(filled, ratio.numerator, ratio.denominator, axis=0, padtype='line')
+            nearest = np.minimum(np.round(np.arange(len(ret))*frame_rate/new_frame_rate).astype(int), len(arr)-1)
+            ret[invalid[nearest]] = np.nan
+            return ret
+        elif method == 'interp':
+            n = int(np.floor((len(arr)-1)*new_frame_rate/frame_rate))+1
+            t = np.arange(n)*frame_rate/new_frame_rate
+            i0 = np.minimum(np.floor(t).astype(int), len(arr)-2)
+            w = (t-i0).reshape((-1,)+(1,)*(arr.ndim-1))
+            return arr[i0]*(1-w)+arr[i0+1]*w
+        raise Exception("Wrong argument for method, should be 'poly' or 'interp'")
+
     @staticmethod
     def pairwise_apply_func(df, func):
         ndf = df._get_numeric_data()
@@ -170,6 +265,14 @@ class Core:
         K = len(lbl)
         data = np.empty((K, K), dtype=float)
         mask = np.isfinite(mat)
+        rows = mask.all(axis=0)
+        if (rows == mask.any(axis=0)).all():
+            # NaN rows shared by all columns (ex, first row of diff features) are dropped once, no pairwise masking
+            mat = mat[:, rows]
+            for i, ac in enumerate(mat):
+                for j, bc in enumerate(mat):
+                    data[i, j] = func(ac, bc) if len(ac) else np.nan
+            return pd.DataFrame(data, index=lbl, columns=lbl)
         for i, ac in enumerate(mat):
             for j, bc in enumerate(mat):
                 valid = mask[i] & mask[j]
@@ -182,3 +285,107 @@ class Core:
                 data[i, j] = c
         return pd.DataFrame(data, index=lbl, columns=lbl)
 
+    @staticmethod
+    def get_moments(arr):
+        r"""Returns column-wise count, mean and central moment sums (M2, M3, M4) ignoring non-finite values
+
+        :params arr: np.array (N x columns)
+        :returns: dict['n', 'mean', 'M2', 'M3', 'M4'] of np.array (columns,) in float64
+        """
+        arr = np.asarray(arr, dtype=np.float64)
+        valid = np.isfinite(arr)
+        n = valid.sum(axis=0).astype(np.float64)
+        mean = np.divide(np.where(valid, arr, 0).sum(axis=0), n, out=np.zeros(n.shape), where=n>0)
+        d = np.where(valid, arr-mean, 0)
+        d2 = d*d
+        return dict(n=n, mean=mean, M2=d2.sum(axis=0), M3=(d2*d).sum(axis=0), M4=(d2*d2).sum(axis=0))
+
+    @staticmethod
+    def merge_moments(a, b):
+        r"""Merges two moments of get_moments (Pébay, 2008)
+        """
+        na, nb = a['n'], b['n']
+        n = na+nb
+        m = np.where(n>0, n, 1) # avoids zero division of empty columns
+        delta = b['mean']-a['mean']
+        mean = a['mean']+delta*nb/m
+        M2 = a['M2']+b['M2']+delta**2*na*nb/m
+        M3 = (a['M3']+b['M3']+delta**3*na*nb*(na-nb)/m**2
+            +3*delta*(na*b['M2']-nb*a['M2'])/m)
+        M4 = (a['M4']+b['M4']+delta**4*na*nb*(na**2-na*nb+nb**2)/m**3
+            +6*delta**2*(na**2*b['M2']+nb**2*a['M2'])/m**2
+            +4*delta*(na*b['M3']-nb*a['M3'])/m)
+        return dict(n=n, mean=mean, M2=M2, M3=M3, M4=M4)
+
+    @staticmethod
+    def moments_to_stat(moments):
+        r"""Returns mean, std, skewness and kurtosis from moments, equal to pandas (unbiased) estimators
+        """
+        n, M2, M3, M4 = moments['n'], moments['M2'], moments['M3'], moments['M4']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n>0, moments['mean'], np.nan)
+            std = np.where(n>1, np.sqrt(M2/(n-1)), np.nan)
+            skew = np.where(M2==0, 0, n*(n-1)**0.5/(n-2)*M3/M2**1.5)
+            skew = np.where(n<3, np.nan, skew)
+            kurt = np.where(M2==0, 0, n*(n+1)*(n-1)*M4/((n-2)*(n-3)*M2**2)-3*(n-1)**2/((n-2)*(n-3)))
+            kurt = np.where(n<4, np.nan, kurt)
+        return dict(mean=mean, std=std, skewness=skew, kurtosis=kurt)
+
+    @staticmethod
+    def get_distance_profile(query, series):
+        r"""Returns z-normalized euclidean distances between query and every sliding window of series (MASS)
+
+        Sliding dot products of all columns are computed at once by FFT, and rolling mean/std by cumulative sums.
+        Distances of multi-column inputs are summed over columns before square root.
+        Windows containing non-finite values are inf. Constant (zero std) columns are z-normalized to zeros.
+
+        :params query: np.array (M,) or (M x columns)
+        :params series: np.array (N,) or (N x columns)
+        :returns: np.array (N-M+1,) distance of window starting at each frame
+        """
+        q = np.asarray(query, dtype=np.float64).reshape(len(query), -1)
+        t = np.asarray(series, dtype=np.float64).reshape(len(series), -1)
+        m, n = len(q), len(t)
+        assert q.shape[1] == t.shape[1], 'query and series should have same number of columns'
+        assert m <= n, 'query should not be longer than series'
+        assert np.isfinite(q).all(), 'query should not contain non-finite values'
+
+        finite = np.isfinite(t)
+        invalid = np.concatenate([[0], np.cumsum(~finite.all(axis=1))])
+        invalid = (invalid[m:]-invalid[:-m]) > 0
+        t = np.where(finite, t, 0)
+        t = t-t.mean(axis=0) # z-normalization is shift invariant, centering keeps cumsum precise
+
+        csum = np.concatenate([np.zeros((1, t.shape[1])), np.cumsum(t, axis=0)])
+        csum2 = np.concatenate([np.zeros((1, t.shape[1])), np.cumsum(t*t, axis=0)])
+        mu_t = (csum[m:]-csum[:-m])/m
+        sigma_t = np.sqrt(np.maximum((csum2[m:]-csum2[:-m])/m-mu_t**2, 0))
+        mu_q, sigma_q = q.mean(axis=0), q.std(axis=0)
+
+        nfft = 1 << int(np.ceil(np.log2(n+m)))
+        QT = np.fft.irfft(np.fft.rfft(t, nfft, axis=0)*np.fft.rfft(q[::-1], nfft, axis=0), nfft, axis=0)[m-1:n]
+
+        eps = 1e-10
+        const_t, const_q = sigma_t <= eps*np.maximum(np.abs(mu_t), 1), sigma_q <= eps*np.maximum(np.abs(mu_q), 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = (QT-m*mu_q*mu_t)/(m*sigma_q*sigma_t)
+        d2 = np.where(const_t | const_q, m*(~const_t)+m*(~const_q), 2*m*(1-np.clip(corr, -1, 1)))
+        distance = np.sqrt(d2.sum(axis=1))
+        distance[invalid] = np.inf
+        return distance
+
+    @staticmethod
+    def get_top_matches(distance, k, exclusion):
+        r"""Returns positions of k smallest finite distances, each at least exclusion apart from smaller ones
+
+        :returns: np.array of positions in ascending distance
+        """
+        distance = np.array(distance, dtype=np.float64)
+        positions = []
+        for _ in range(k):
+            i = distance.argmin()
+            if not np.isfinite(distance[i]):
+                break
+            positions.append(i)
+            distance[max(0, i-exclusion+1):i+exclusion] = np.inf
+        return np.array(positions, dtype=np.int64)
@@ -1,13 +1,36 @@
 __all__ = ['dataset']
 
 import os
-import pkg_resources
-import avatarpy
-
-DATA_PATH = pkg_resources.resource_filename("avatarpy", 'data/')
-FILES = os.listdir(DATA_PATH)
-dataset = dict()
-for FILE in FILES:
-    name, ext = os.path.splitext(os.path.basename(FILE))
-    if ext.lower()=='.csv':
-        dataset[name] = os.path.join(DATA_PATH, FILE)
\ No newline at end of file
+from collections.abc import Mapping
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+class Dataset(Mapping):
+    """Dict of sample csv paths provided by avatarpy package. Data directory is listed on first access"""
+    def __init__(self, path=DATA_PATH):
+        self._path = path
+        self._files = None
+
+    @property
+    def files(self):
+        if self._files is None:
+            self._files = dict()
+            for FILE in sorted(os.listdir(self._path)):
+                name, ext = os.path.splitext(os.path.basename(FILE))
+                if ext.lower()=='.csv':
+                    self._files[name] = os.path.join(self._path, FILE)
+        return self._files
+
+    def __getitem__(self, key):
+        return self.files[key]
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __repr__(self):
+        return repr(self.files)
+
+dataset = Dataset()
@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from avatarpy.interval import Intervals
 
 class Describe:
     def __init__(self, parent=None):
@@ -11,28 +13,52 @@ class Describe:
         df = pd.concat([getattr(self, x)(indices=indices, assign_ID=assign_ID, assign_tags=assign_tags) for x in include]).reset_index(drop=True)
         return df
 
+    def select(self, data, indices=None):
+        """Returns rows of data by integer frame positions
+
+        :param indices: {None|Intervals|slice|array} Intervals and slice are frame positions, boolean array is mask of frames,
+            other array is index labels
+        """
+        if indices is None:
+            return data
+        if isinstance(indices, Intervals):
+            return data.iloc[indices.to_positions()]
+        if isinstance(indices, slice):
+            return data.iloc[indices]
+        mask = np.asarray(indices)
+        if mask.dtype == bool:
+            assert len(mask) == len(data), f'Boolean indices length({len(mask)}) miss match with avatar index({len(data)})'
+            return data.iloc[np.flatnonzero(mask)]
+        positions = self.__parent.index.get_indexer(indices)
+        assert (positions>=0).all(), 'indices not found in avatar index'
+        return data.iloc[positions]
+
     def corr(self, indices=None, features=['velocity', 'acceleration', 'angle', 'angle_velocity', 'angle_acceleration', 'stretch_index'], 
-        assign_ID=True, assign_tags=True):
-        """Returns pearson correlation of given features
+        method='pearson', assign_ID=True, assign_tags=True):
+        """Returns pearson (or spearman) correlation and cross correlation max and lag of given features
+
+        :param method: {'pearson'(default)|'spearman'}
         """
+        parent = self.__parent
         corrs = []
         for feature in features:
-            data = self.__parent[feature]
-            if indices is not None:
-                data = data.loc[indices]
-            corrs.extend([
-                self.__parent.corr(data)        .reset_index().rename(
-                    columns={'index':'target', 0:'value'}).assign(feature=feature, category='correlation', type='pearson'),
-                self.__parent.xcorr_max(data)   .reset_index().rename(
-                    columns={'index':'target', 0:'value'}).assign(feature=feature, category='correlation', type='xcorr_max'),
-                self.__parent.xcorr_lag(data)   .reset_index().rename(
-                    columns={'index':'target', 0:'value'}).assign(feature=feature, category='correlation', type='xcorr_lag'),
-            ])
+            data = self.select(parent[feature], indices).astype(np.float64, copy=False) # accumulate in float64
+            batch = parent.batch_corr(data, method=method, frame_rate=parent.frame_rate)
+            if batch is not None:
+                series = {name:batch[name].dropna() for name in batch.columns}
+            else: # columns with different NaN rows require pairwise masking
+                series = {
+                    method:parent.flatten_pairwise_df(data.corr(method)),
+                    'xcorr_max':parent.xcorr_max(data),
+                    'xcorr_lag':parent.xcorr_lag(data),
+                }
+            corrs.extend([pd.DataFrame(dict(target=s.index, value=s.values)).assign(feature=feature, category='correlation', type=name)
+                for name, s in series.items()])
         df = pd.concat(corrs).reset_index(drop=True)
         if assign_ID:
-            df = df.assign(ID=self.__parent.ID)
+            df = df.assign(ID=parent.ID)
         if assign_tags:
-            df = df.assign(**self.__parent.tags)
+            df = df.assign(**parent.tags)
         return df
     
     def stat(self, indices=None, features=['velocity', 'acceleration', 'angle', 'angle_velocity', 'angle_acceleration', 'vector_length'], 
@@ -41,9 +67,7 @@ class Describe:
         """
         stats = []
         for feature in features:
-            data = self.__parent[feature]
-            if indices is not None:
-                data = data.loc[indices]
+            data = self.select(self.__parent[feature], indices).astype(np.float64, copy=False) # accumulate in float64
             stats.extend([
                 data.mean()   .reset_index().rename(
                     columns={'index':'target', 0:'value'}).assign(feature=feature, category='statistics', type='mean'),
@@ -64,4 +88,29 @@ class Describe:
         if assign_tags:
             df = df.assign(**self.__parent.tags)
         return df
-    
\ No newline at end of file
+    
+    def spectral(self, indices=None, features=['velocity', 'angle'], bands=[(0, 2), (2, 5), (5, 10)], nperseg='2s',
+        assign_ID=True, assign_tags=True):
+        """Returns spectral features (band power, dominant frequency, spectral entropy) of given features from Welch PSD
+        """
+        spectral = self.__parent.spectral
+        specs = []
+        for feature in features:
+            psd = spectral.psd(feature, nperseg=nperseg, indices=indices)
+            freqs, Pxx = psd.index.values, psd.values
+            powers = spectral.get_band_power(freqs, Pxx, bands)
+            for (low, high), power in zip(bands, powers):
+                specs.append(pd.DataFrame(dict(target=psd.columns, value=power)).assign(
+                    feature=feature, category='spectral', type=f'band_power_{low}_{high}'))
+            specs.extend([
+                pd.DataFrame(dict(target=psd.columns, value=spectral.get_dominant_frequency(freqs, Pxx))).assign(
+                    feature=feature, category='spectral', type='dominant_frequency'),
+                pd.DataFrame(dict(target=psd.columns, value=spectral.get_spectral_entropy(freqs, Pxx))).assign(
+                    feature=feature, category='spectral', type='spectral_entropy'),
+            ])
+        df = pd.concat(specs).reset_index(drop=True)
+        if assign_ID:
+            df = df.assign(ID=self.__parent.ID)
+        if assign_tags:
+            df = df.assign(**self.__parent.tags)
+        return df
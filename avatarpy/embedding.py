@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+class Embedding:
+    def __init__(self, parent=None):
+        self.__parent = parent
+        self.scaler = None
+        self.pca = None
+        self.reducer = None
+        self.sample = None
+        self._kws = {}
+
+    def __repr__(self):
+        return f'Embedding object of {self.__parent}'
+
+    def __call__(self, window=20, stride=1, features=['velocity', 'acceleration', 'angle', 'angle_velocity', 'angle_acceleration', 'stretch_index'],
+        n_components=20, sample_size=10000, reducer='umap', standardize=True, batch_size=1024, random_state=None, verbose=1):
+        r"""Fits embedding of feature windows of all avatars without holding all windows in memory.
+
+        Windows are streamed avatar by avatar (see AvaLens.gather_windows) through
+        1) StandardScaler.partial_fit (if standardize), 2) IncrementalPCA.partial_fit,
+        3) reservoir sampling of PCA projected windows, on which reducer (UMAP) is fitted.
+        Windows containing non-finite values are skipped. Project all windows by `transform`.
+
+        :param window: (int|str) window size, int is frames, str is seconds (ex, '1s')
+        :param stride: (int|str) frames between window starts
+        :param n_components: (int) number of principal components
+        :param sample_size: (int) number of windows uniformly sampled to fit reducer
+        :param reducer: {'umap'(default)|None|object} object with fit and transform (ex, umap.UMAP(n_neighbors=30)).
+            If None, principal components are the embedding
+        """
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.decomposition import IncrementalPCA
+
+        # reducer is resolved before streaming passes, so missing umap-learn fails fast
+        if isinstance(reducer, str):
+            assert reducer == 'umap', "reducer should be 'umap', None or object with fit and transform"
+            try:
+                import umap
+            except ImportError:
+                raise ImportError("reducer='umap' requires umap-learn. Install it or provide other reducer")
+            reducer = umap.UMAP(random_state=random_state)
+
+        self._kws = dict(window=window, stride=stride, features=features, batch_size=batch_size, flatten=True, dropna=True)
+        rng = np.random.default_rng(random_state)
+
+        self.scaler = None
+        if standardize:
+            scaler = StandardScaler()
+            for _, _, batch in self.__parent.gather_windows(**self._kws):
+                if len(batch):
+                    scaler.partial_fit(batch)
+            self.scaler = scaler
+        self.log(verbose, 'scaler fitted')
+
+        self.pca = None
+        pca = IncrementalPCA(n_components=n_components)
+        pending, n_windows = None, 0
+        for _, _, batch in self.batches(pca=False):
+            # partial_fit requires at least n_components windows, so pending batch is fitted only when
+            # next batch is also long enough, and short batches (including trailing one) are merged into it
+            n_windows += len(batch)
+            if pending is not None and len(pending) >= n_components and len(batch) >= n_components:
+                pca.partial_fit(pending)
+                pending = batch
+            else:
+                pending = batch if pending is None else np.concatenate([pending, batch])
+        assert n_windows >= n_components, f'Number of valid windows({n_windows}) is less than n_components({n_components})'
+        pca.partial_fit(pending)
+        self.pca = pca
+        self.log(verbose, f'pca fitted (explained variance {self.pca.explained_variance_ratio_.sum():.3f})')
+
+        # reservoir by random priority: smallest sample_size keys are uniform sample without replacement
+        keys, sample = np.empty(0), np.empty((0, n_components))
+        for _, _, batch in self.batches():
+            keys = np.concatenate([keys, rng.random(len(batch))])
+            sample = np.concatenate([sample, batch])
+            if len(keys) > sample_size:
+                keep = np.argpartition(keys, sample_size)[:sample_size]
+                keys, sample = keys[keep], sample[keep]
+        self.sample = sample
+
+        self.reducer = reducer
+        if reducer is not None:
+            reducer.fit(sample)
+        self.log(verbose, f'reducer fitted on {len(sample)} windows')
+        return self
+
+    def log(self, verbose, message):
+        if verbose==1:
+            print(f'[{datetime.now()}] Embedding: {message}', end='\r')
+        if verbose==2:
+            print(f'[{datetime.now()}] Embedding: {message}')
+
+    def batches(self, pca=True):
+        """Yields (avatar, starts, batch) of standardized (and PCA projected) windows"""
+        for avatar, starts, batch in self.__parent.gather_windows(**self._kws):
+            if not len(batch):
+                continue
+            if self.scaler is not None:
+                batch = self.scaler.transform(batch)
+            if pca:
+                batch = self.pca.transform(batch)
+            yield avatar, starts, batch
+
+    def transform_batches(self):
+        """Yields (avatar, starts, embedding) of all windows in batches"""
+        assert self.pca is not None, 'Embedding is not fitted. Call embedding(...) first'
+        for avatar, starts, batch in self.batches():
+            yield avatar, starts, self.reducer.transform(batch) if self.reducer is not None else batch
+
+    def transform(self, assign_ID=True, assign_tags=True):
+        """Returns embedding of all windows (windows x dims) with ID, tags and time (index of window start)"""
+        frames = []
+        for avatar, starts, embedding in self.transform_batches():
+            df = pd.DataFrame(embedding).assign(time=avatar.index[starts])
+            if assign_ID:
+                df = df.assign(ID=avatar.ID)
+            if assign_tags:
+                df = df.assign(**avatar.tags)
+            frames.append(df)
+        return pd.concat(frames).reset_index(drop=True)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+class Intervals:
+    def __init__(self, starts=[], stops=[]):
+        r"""Sorted, non-overlapping [start, stop) frame position pairs of annotations and events
+
+        :param starts: array of int, start frame positions (inclusive)
+        :param stops: array of int, stop frame positions (exclusive)
+        """
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        assert self.starts.shape == self.stops.shape, 'starts and stops should be equal length'
+
+    @classmethod
+    def from_boolean(cls, boolean):
+        """Returns intervals of consecutive True runs in boolean array or pd.Series"""
+        boolean = np.asarray(boolean, dtype=bool)
+        edges = np.diff(np.concatenate([[False], boolean, [False]]).astype(np.int8))
+        return cls(np.flatnonzero(edges==1), np.flatnonzero(edges==-1))
+
+    def __repr__(self):
+        return f'Intervals({len(self)} intervals, {self.total} frames)'
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for start, stop in zip(self.starts, self.stops):
+            yield slice(start, stop)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return slice(self.starts[item], self.stops[item])
+        return Intervals(self.starts[item], self.stops[item])
+
+    @property
+    def lengths(self):
+        """Number of frames of each interval"""
+        return self.stops-self.starts
+
+    @property
+    def total(self):
+        """Total number of frames covered by intervals"""
+        return int(self.lengths.sum())
+
+    def to_positions(self):
+        """Returns integer frame positions covered by intervals"""
+        lengths = self.lengths
+        offsets = np.repeat(self.starts-np.cumsum(lengths)+lengths, lengths)
+        return np.arange(lengths.sum())+offsets
+
+    def to_boolean(self, n):
+        """Returns boolean array of length n, True inside intervals"""
+        edges = np.zeros(n+1, dtype=np.int64)
+        np.add.at(edges, self.starts, 1)
+        np.add.at(edges, self.stops, -1)
+        return np.cumsum(edges[:-1])>0
+
+    def to_frame(self, index=None):
+        """Returns dataframe of start, stop positions. If index is provided, start and stop time are added"""
+        df = pd.DataFrame(dict(start=self.starts, stop=self.stops, length=self.lengths))
+        if index is not None:
+            df = df.assign(start_time=index[self.starts], stop_time=index[self.stops-1])
+        return df
+
+    def split(self, length):
+        """Returns consecutive sub-intervals of fixed length. Remainders shorter than length are dropped"""
+        n = self.lengths//length
+        starts = np.repeat(self.starts, n) + (np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n))*length
+        return Intervals(starts, starts+length)
+
+    def _candidates(self, starts, stops):
+        # disjoint & sorted intervals have sorted stops, so overlaps of [start, stop) are a contiguous block
+        lo = np.searchsorted(self.stops, starts, side='right')
+        hi = np.searchsorted(self.starts, stops, side='left')
+        return lo, np.maximum(hi, lo)
+
+    def contains(self, positions):
+        """Returns boolean array whether each frame position falls in any interval"""
+        positions = np.asarray(positions)
+        i = np.searchsorted(self.starts, positions, side='right')-1
+        inside = i>=0
+        inside[inside] = positions[inside] < self.stops[i[inside]]
+        return inside
+
+    def overlaps(self, other):
+        """Returns boolean array whether each interval overlaps any interval of other"""
+        lo, hi = other._candidates(self.starts, self.stops)
+        return hi>lo
+
+    def overlapping(self, other):
+        """Returns intervals overlapping any interval of other (ex, grooming bouts overlapping rearing)"""
+        return self[self.overlaps(other)]
+
+    def within(self, other):
+        """Returns boolean array whether each interval is fully contained by an interval of other"""
+        i = np.searchsorted(other.starts, self.starts, side='right')-1
+        inside = i>=0
+        inside[inside] = self.stops[inside] <= other.stops[i[inside]]
+        return inside
+
+    def overlap_pairs(self, other):
+        """Returns (N x 2) array of interval index pairs (self, other) which overlap each other"""
+        lo, hi = other._candidates(self.starts, self.stops)
+        n = hi-lo
+        left = np.repeat(np.arange(len(self)), n)
+        right = np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n)+np.repeat(lo, n)
+        return np.stack([left, right], axis=1)
+
+    def nearest(self, positions):
+        """Returns index of nearest interval and distance in frames (0 if inside) for each frame position"""
+        positions = np.asarray(positions)
+        assert len(self), 'nearest requires at least one interval'
+        i = np.clip(np.searchsorted(self.starts, positions, side='right')-1, 0, len(self)-1)
+        j = np.clip(i+1, 0, len(self)-1)
+        dist_i = np.maximum(0, np.maximum(self.starts[i]-positions, positions-self.stops[i]+1))
+        dist_j = np.maximum(0, np.maximum(self.starts[j]-positions, positions-self.stops[j]+1))
+        nearest = np.where(dist_j<dist_i, j, i)
+        return nearest, np.minimum(dist_i, dist_j)
@@ -0,0 +1,49 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class Prefetcher:
+    def __init__(self, avatars, prefetch=2, workers=None, unload=True):
+        r"""Iterator over avatars loading next recordings on background threads while current avatar is processed
+
+        At most `prefetch` avatars are loaded ahead of the one being processed, so memory is bounded and
+        loading waits (back-pressure) until consumer takes next avatar.
+
+        :param avatars: list of avatars, usually lazy (ex, AvaLens(...).add_folder(root, lazy=True).avatars)
+        :param prefetch: (int) number of avatars loaded ahead
+        :param workers: (int) number of loading threads (default: prefetch)
+        :param unload: (bool) if True, avatars loaded by prefetcher are unloaded when consumer moves to next one
+        """
+        assert prefetch >= 1, 'prefetch should be at least 1'
+        self.avatars = avatars
+        self.prefetch = prefetch
+        self.workers = workers if workers else prefetch
+        self.unload = unload
+
+    def __repr__(self):
+        return f'Prefetcher({len(self)} avatars, prefetch={self.prefetch}, workers={self.workers})'
+
+    def __len__(self):
+        return len(self.avatars)
+
+    def __iter__(self):
+        """Yields loaded avatars in order"""
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        queue, pending = deque(), iter(self.avatars)
+        def submit():
+            avatar = next(pending, None)
+            if avatar is not None:
+                queue.append((avatar, avatar.loaded, executor.submit(avatar.load)))
+        try:
+            for _ in range(self.prefetch):
+                submit()
+            while queue:
+                avatar, was_loaded, future = queue.popleft()
+                future.result()
+                submit()
+                yield avatar
+                if self.unload and not was_loaded and avatar._reloadable:
+                    avatar.unload()
+        finally:
+            for _, _, future in queue: # consumer stopped early, queued loads are not started
+                future.cancel()
+            executor.shutdown(wait=True)
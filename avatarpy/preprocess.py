@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from avatarpy.interval import Intervals
+
+class Preprocess:
+    def __init__(self, parent=None):
+        self.__parent = parent
+
+    def __repr__(self):
+        return f'Preprocess object of {self.__parent}'
+
+    def get_validity(self, max_jump=None, window=5):
+        """Returns T-series boolean dataframe (N x nodes), True where node coords are finite and plausible
+
+        :param max_jump: distance from centered rolling median of node coords above which frame is a tracking jump.
+            If None, only non-finite coords are invalid
+        :param window: (int) number of frames of rolling median
+        """
+        avatar = self.__parent
+        tensor = avatar.node_tensor
+        valid = np.isfinite(tensor).all(axis=-1)
+        if max_jump is not None:
+            n_frames, n_nodes, _ = tensor.shape
+            median = pd.DataFrame(tensor.reshape(n_frames, -1)).rolling(window, center=True, min_periods=1).median()
+            with np.errstate(invalid='ignore'):
+                valid &= avatar.get_distance(tensor-median.values.reshape(n_frames, n_nodes, 3)) <= max_jump
+        return pd.DataFrame(valid, index=avatar.index, columns=list(avatar._nodes.keys()))
+
+    def get_gaps(self, valid):
+        """Returns dict of gap intervals (consecutive invalid frames) of each node"""
+        return {node:Intervals.from_boolean(~valid[node].values) for node in valid.columns}
+
+    def clean(self, max_jump=None, window=5, max_gap=None, method='linear'):
+        """Returns avatar whose invalid coords (non-finite or jumps) are interpolated.
+        Gaps longer than max_gap frames and gaps at the edges stay NaN (masked).
+        Validity mask of measured coords is kept in `avatar.valid`
+
+        :param max_jump: see get_validity
+        :param max_gap: (int) longest gap in frames to be interpolated. If None, all inner gaps are interpolated
+        :param method: interpolation method of pd.DataFrame.interpolate
+        """
+        valid = self.get_validity(max_jump=max_jump, window=window)
+        avatar = deepcopy(self.__parent)
+        columns = np.array(list(avatar._nodes.values()))
+        mask = np.repeat(valid.values, 3, axis=1)
+        data = avatar.data[columns.ravel()].where(mask)
+        data = data.interpolate(method=method, axis=0, limit_area='inside')
+        if max_gap is not None:
+            fillable = valid.values.copy()
+            for k, intervals in enumerate(self.get_gaps(valid).values()):
+                short = intervals[intervals.lengths <= max_gap]
+                fillable[:, k] |= short.to_boolean(len(fillable))
+            data = data.where(np.repeat(fillable, 3, axis=1))
+        avatar.data[columns.ravel()] = data.astype(avatar.dtype).values
+        avatar.set_nodes()
+        avatar.set_vectors()
+        avatar._valid = valid
+        return avatar
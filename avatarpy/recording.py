@@ -0,0 +1,142 @@
+import json
+import numpy as np
+import pandas as pd
+
+MAGIC = b'AVATARPY'
+VERSION = 1
+ALIGN = 64
+
+class Recording:
+    extension = '.ava'
+
+    def __init__(self, path):
+        r"""Reader of binary avatar recording (.ava). Only header is read on open, coordinates are memory-mapped
+
+        File layout:
+            MAGIC (8 bytes) | header length (uint64 little endian) | JSON header | padding to 64 bytes
+            | coords (float32 little endian, frames x columns, C order) | padding | annotations (packed bits, labels x frames)
+
+        JSON header holds version, n_frames, columns, skeleton schema (nodes), frame_rate, start_frame, ID, tags,
+        leveled flag, annotation names and byte offsets of arrays.
+
+        :param path: .ava file path
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            assert f.read(len(MAGIC)) == MAGIC, f'{path} is not avatarpy recording'
+            size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            self.header = json.loads(f.read(size).decode('utf-8'))
+        assert self.header['version'] <= VERSION, f"unsupported recording version {self.header['version']}"
+
+    def __repr__(self):
+        return f'Recording({self.path}, frames={self.n_frames}, frame_rate={self.frame_rate})'
+
+    def __len__(self):
+        return self.n_frames
+
+    @property
+    def n_frames(self):
+        return self.header['n_frames']
+
+    @property
+    def frame_rate(self):
+        return self.header['frame_rate']
+
+    @property
+    def ID(self):
+        return self.header['ID']
+
+    @property
+    def tags(self):
+        return self.header['tags']
+
+    @property
+    def nodes(self):
+        """Skeleton schema, node name to coordinate columns"""
+        return self.header['nodes']
+
+    @property
+    def leveled(self):
+        """Whether stored coords are already leveled"""
+        return self.header['leveled']
+
+    @property
+    def coords(self):
+        """Memory-mapped float32 array (frames x columns) of coords"""
+        shape = (self.n_frames, len(self.header['columns']))
+        if not self.n_frames:
+            return np.empty(shape, dtype='<f4')
+        return np.memmap(self.path, dtype='<f4', mode='r', offset=self.header['coords_offset'], shape=shape)
+
+    def get_frames(self, start=None, stop=None):
+        """Returns frame slice of time range [start, stop) in seconds (frames if frame_rate is None)"""
+        def to_frame(t, default):
+            if t is None:
+                return default
+            frame = int(np.ceil(t*self.frame_rate-1e-9)) if self.frame_rate else int(t)
+            return min(max(frame-self.header['start_frame'], 0), self.n_frames)
+        return slice(to_frame(start, 0), to_frame(stop, self.n_frames))
+
+    def read(self, start=None, stop=None, dtype=np.float64):
+        """Returns coords dataframe of time range [start, stop) indexed by frame number (same as csv read)"""
+        frames = self.get_frames(start, stop)
+        index = pd.RangeIndex(frames.start, frames.stop)+self.header['start_frame']
+        return pd.DataFrame(np.asarray(self.coords[frames], dtype=dtype), index=index, columns=self.header['columns'])
+
+    def read_annotation(self, start=None, stop=None):
+        """Returns boolean dataframe of embedded annotations of time range [start, stop) indexed by frame number"""
+        frames = self.get_frames(start, stop)
+        names = self.header['annotations']
+        index = pd.RangeIndex(frames.start, frames.stop)+self.header['start_frame']
+        if not names:
+            return pd.DataFrame(index=index)
+        n_bytes = (self.n_frames+7)//8
+        packed = np.memmap(self.path, dtype=np.uint8, mode='r', offset=self.header['annotation_offset'], shape=(len(names), n_bytes))
+        first, last = frames.start//8, (frames.stop+7)//8 # unpack only bytes of range
+        bits = np.unpackbits(np.asarray(packed[:, first:last]), axis=1)[:, frames.start-first*8:frames.stop-first*8]
+        return pd.DataFrame(bits.T.astype(bool), index=index, columns=names)
+
+    def to_avatar(self, start=None, stop=None, **kwargs):
+        """Returns Avatar of time range [start, stop). kwargs are passed to Avatar (ex, dtype)"""
+        from avatarpy.avatar import Avatar
+        return Avatar(self.path, time_range=(start, stop), **kwargs)
+
+    @staticmethod
+    def write(path, avatar):
+        """Writes avatar coords (float32), skeleton schema, frame_rate, ID, tags and annotations into path"""
+        data = avatar.data
+        frame_rate = avatar.frame_rate
+        annotation = avatar.annotation.add()
+        start = avatar.index[0] if len(avatar.index) else 0
+        header = dict(
+            version=VERSION,
+            n_frames=len(data),
+            columns=[int(c) for c in data.columns],
+            nodes={k:list(v) for k, v in avatar._nodes.items()},
+            frame_rate=frame_rate,
+            start_frame=int(round(start*frame_rate)) if frame_rate else int(start),
+            ID=avatar.ID if isinstance(avatar.ID, (str, int, float)) else str(avatar.ID),
+            tags=avatar.tags,
+            leveled=bool(avatar._leveled),
+            annotations=[str(c) for c in annotation.columns],
+        )
+        def align(n):
+            return (n+ALIGN-1)//ALIGN*ALIGN
+        # offsets depend on header length, so header is sized with placeholders of final width first
+        header.update(coords_offset=0, annotation_offset=0)
+        size = len(json.dumps(header).encode('utf-8'))+40
+        coords_offset = align(len(MAGIC)+8+size)
+        annotation_offset = align(coords_offset+len(data)*len(data.columns)*4)
+        header.update(coords_offset=coords_offset, annotation_offset=annotation_offset)
+        text = json.dumps(header).encode('utf-8').ljust(size)
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.array([size], dtype='<u8').tobytes())
+            f.write(text)
+            f.write(b'\0'*(coords_offset-f.tell()))
+            f.write(np.ascontiguousarray(data.values, dtype='<f4').tobytes())
+            f.write(b'\0'*(annotation_offset-f.tell()))
+            if len(annotation.columns):
+                f.write(np.packbits(annotation.values.astype(bool).T, axis=1).tobytes())
+        return path
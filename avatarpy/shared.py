@@ -0,0 +1,149 @@
+import os
+import sys
+import uuid
+import tempfile
+import numpy as np
+import pandas as pd
+
+_created = set() # shm segments created by this process (or its fork parent), registered to its resource tracker
+TRACK = sys.version_info >= (3, 13) # SharedMemory(track=False) attaches without resource tracker
+
+class SharedAvatar:
+    def __init__(self, backend=None, directory=None):
+        r"""Picklable handle of avatar arrays placed in shared memory or memory-mapped files.
+        Pickled handle holds metadata only (segment names, shapes, columns), and `attach` rebuilds
+        avatar on shared buffers without copying coordinates and shared features.
+
+        Owner process creates handle by Avatar.share and should keep it until workers are done, then call unlink.
+
+        :param backend: {None(default)|'shm'|'memmap'} multiprocessing.shared_memory or .npy files memory-mapped read-only.
+            If None, 'shm' on python>=3.13 (attach without resource tracker), otherwise 'memmap'
+        :param directory: directory of .npy files for 'memmap' backend. If None, temporary directory removed by unlink
+        """
+        backend = backend if backend else ('shm' if TRACK else 'memmap')
+        assert backend in ['shm', 'memmap'], "backend should be 'shm' or 'memmap'"
+        self.temporary = backend == 'memmap' and not directory
+        if self.temporary:
+            directory = tempfile.mkdtemp(prefix='avatarpy_')
+        self.backend = backend
+        self.directory = directory
+        self.arrays = {}
+        self.meta = {}
+        self._segments = {}
+
+    def __repr__(self):
+        return f"SharedAvatar({self.meta.get('ID')}, backend={self.backend}, arrays={list(self.arrays)})"
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_segments'] = {} # open segments are not picklable, workers reopen them by name
+        return state
+
+    def __deepcopy__(self, memo):
+        # handle is shared metadata, copied avatars keep referring same segments
+        return self
+
+    @classmethod
+    def create(cls, avatar, features=[], backend=None, directory=None):
+        """Returns handle of avatar whose coords, index, given features and annotation are copied once into shared segments"""
+        handle = cls(backend=backend, directory=directory)
+        if handle.backend == 'memmap':
+            os.makedirs(handle.directory, exist_ok=True)
+        handle.meta = dict(csv_path=avatar.csv_path, ID=avatar.ID, tags=avatar.tags, frame_rate=avatar.frame_rate,
+            leveled=avatar._leveled, dtype=avatar.dtype.str, features=list(features))
+        handle.put('data', avatar.data.values, list(avatar.data.columns))
+        handle.put('index', avatar.index.values)
+        for feature in features:
+            data = avatar[feature]
+            handle.put(f'feature.{feature}', data.values, list(data.columns))
+        annotation = avatar.annotation.add()
+        if len(annotation.columns):
+            handle.put('annotation', annotation.values.astype(bool), list(annotation.columns))
+        return handle
+
+    def put(self, key, array, columns=None):
+        """Copies array into new shared segment of key"""
+        array = np.ascontiguousarray(array)
+        if self.backend == 'shm':
+            from multiprocessing.shared_memory import SharedMemory
+            segment = SharedMemory(create=True, size=max(array.nbytes, 1))
+            name = segment.name
+            _created.add(name)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        else:
+            name = os.path.join(self.directory, f'{uuid.uuid4().hex}.npy')
+            segment = np.lib.format.open_memmap(name, mode='w+', dtype=array.dtype, shape=array.shape)
+            segment[...] = array
+            segment.flush()
+        self._segments[key] = segment
+        self.arrays[key] = dict(name=name, shape=array.shape, dtype=array.dtype.str, columns=columns)
+
+    def get(self, key):
+        """Returns numpy array of key on shared buffer (no copy)"""
+        info = self.arrays[key]
+        if key not in self._segments:
+            if self.backend == 'shm':
+                self._segments[key] = self.open_shm(info['name'])
+            else:
+                self._segments[key] = np.load(info['name'], mmap_mode='r')
+        segment = self._segments[key]
+        if self.backend == 'shm':
+            return np.ndarray(info['shape'], dtype=info['dtype'], buffer=segment.buf)
+        return segment
+
+    @staticmethod
+    def open_shm(name):
+        """Opens existing shared memory without keeping it registered to resource tracker, so exit of a process
+        that only attached never unlinks segment of owner.
+        Before python 3.13 segment is unregistered after opening (unless created by this process or its fork parent).
+        Workers spawned by owner share its tracker, which then reports missing entry when owner unlinks,
+        so 'memmap' backend is default there
+        """
+        from multiprocessing import shared_memory, resource_tracker
+        if TRACK:
+            return shared_memory.SharedMemory(name=name, track=False)
+        segment = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+    def attach(self):
+        """Returns Avatar built on shared arrays. Coords are used as stored (no leveling again).
+        Shared features are served by avatar[feature] (ex, describe) without recomputation
+        """
+        from avatarpy.avatar import Avatar
+
+        index = pd.Index(self.get('index'))
+        data = pd.DataFrame(self.get('data'), index=index, columns=self.arrays['data']['columns'], copy=False)
+        meta = self.meta
+        avatar = Avatar(meta['csv_path'], frame_rate=None, ID=meta['ID'], tags=meta['tags'],
+            horizontal_correction=False, dtype=np.dtype(meta['dtype']), data=data)
+        avatar.frame_rate = meta['frame_rate']
+        avatar._leveled = meta.get('leveled', False)
+        avatar._shared = self # keeps segments open while avatar is alive
+        for feature in meta['features']:
+            info = self.arrays[f'feature.{feature}']
+            avatar._cache[('feature', feature)] = pd.DataFrame(self.get(f'feature.{feature}'), index=index, columns=info['columns'], copy=False)
+        if 'annotation' in self.arrays:
+            avatar.annotation.update(pd.DataFrame(self.get('annotation'), index=index, columns=self.arrays['annotation']['columns']))
+        return avatar
+
+    def close(self):
+        """Closes segments opened in this process"""
+        if self.backend == 'shm':
+            for segment in self._segments.values():
+                segment.close()
+        self._segments = {}
+
+    def unlink(self):
+        """Releases shared segments. Should be called once by owner after workers are done"""
+        for key, info in self.arrays.items():
+            if self.backend == 'shm':
+                segment = self._segments[key] if key in self._segments else self.open_shm(info['name'])
+                segment.unlink()
+                _created.discard(info['name'])
+            elif os.path.exists(info['name']):
+                os.remove(info['name'])
+        self.close()
+        if self.temporary and os.path.isdir(self.directory):
+            os.rmdir(self.directory)
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from itertools import permutations, combinations
+from avatarpy.core import Core
+from avatarpy.avatar import Avatar
+
+class Social(Core):
+    def __init__(self, csv_paths=None, frame_rate=20, IDs=None, tags={}, horizontal_correction=True, dtype=np.float64, data=None):
+        r"""Multi-animal container of avatars recorded together. Coords of all animals are stored in single
+        numpy 4d array (N x animals x nodes x 3), and pairwise inter-animal features are computed at once for all pairs.
+
+        :param csv_paths: list of csv paths, one per animal. Recordings are truncated to the shortest one
+        :param IDs: list of animal IDs (default: 0, 1, ...)
+        :param horizontal_correction: if True, all animals are leveled with single floor regressed on all feet
+        :param data: numpy 4d array (N x animals x nodes x 3) used instead of csv_paths
+        """
+        columns = np.array(list(Avatar._nodes.values()))
+        if data is None:
+            frames = [pd.read_csv(csv_path, header=None, dtype=dtype).values for csv_path in csv_paths]
+            n = min(len(frame) for frame in frames)
+            data = np.stack([frame[:n, columns] for frame in frames], axis=1)
+        self._tensor = np.ascontiguousarray(data, dtype=dtype)
+        self._csv_paths = csv_paths
+        self._frame_rate = frame_rate
+        self._IDs = list(IDs) if IDs is not None else list(range(self.n_animals))
+        self._tags = tags
+        self._avatars = None
+        self._leveled = False
+        assert len(self.IDs) == self.n_animals, 'Number of IDs should be equal to number of animals'
+        if horizontal_correction:
+            self.level()
+
+    def __repr__(self):
+        return f'Social({self.IDs})'
+
+    @property
+    def tensor(self):
+        """Numpy 4d array (N x animals x nodes x 3) of coords of all animals"""
+        return self._tensor
+
+    @property
+    def frame_rate(self):
+        """Number of frames recorded in 1 second. (a.k.a. data rate, sampling rate)"""
+        return self._frame_rate
+
+    @property
+    def IDs(self):
+        """IDs of animals"""
+        return self._IDs
+
+    @property
+    def tags(self):
+        """User provided tags for social instance"""
+        return self._tags
+
+    @property
+    def n_animals(self):
+        """Number of animals"""
+        return self.tensor.shape[1]
+
+    @property
+    def index(self):
+        """Index of recording timecourse. If frame rate is provided, unit is second"""
+        frames = pd.RangeIndex(len(self.tensor))
+        return frames/self.frame_rate if self.frame_rate else frames
+
+    def level(self):
+        """Levels all animals in place with floor regressed on lfoot and rfoot nodes of all animals"""
+        feet = self.tensor[:, :, [self.get_node_position('lfoot'), self.get_node_position('rfoot')]].reshape(-1, 3)
+        X = np.column_stack([feet[:, 0], feet[:, 1], np.ones(len(feet))])
+        (a, b, _), *_ = np.linalg.lstsq(X, feet[:, 2], rcond=None)
+        R = self.get_rotation_matrix(np.array([[-a, -b, 1]]), np.array([[0, 0, 1]]))[0]
+        self._tensor = self.tensor @ R.T.astype(self.tensor.dtype) # new array, data given by caller is never rotated
+        self._avatars = None
+        self._leveled = True
+        return self
+
+    def get_node_position(self, node):
+        """Returns position of node in tensor"""
+        return list(Avatar._nodes.keys()).index(node)
+
+    def get_node(self, node):
+        """Returns numpy 3d array (N x animals x 3) of node coords of all animals"""
+        return self.tensor[:, :, self.get_node_position(node)]
+
+    def get_avatar(self, i):
+        """Returns Avatar of i-th animal sharing memory with tensor (no copy)"""
+        n_frames, _, n_nodes, _ = self.tensor.shape
+        columns = np.array(list(Avatar._nodes.values())).ravel()
+        data = pd.DataFrame(self.tensor[:, i].reshape(n_frames, n_nodes*3), columns=columns)
+        csv_path = self._csv_paths[i] if self._csv_paths else None
+        avatar = Avatar(csv_path, frame_rate=self.frame_rate, ID=self.IDs[i], tags=self.tags,
+            horizontal_correction=False, dtype=self.tensor.dtype, data=data)
+        avatar._leveled = self._leveled
+        return avatar
+
+    @property
+    def avatars(self):
+        """List of Avatar views of all animals"""
+        if self._avatars is None:
+            self._avatars = [self.get_avatar(i) for i in range(self.n_animals)]
+        return self._avatars
+
+    @property
+    def pairs(self):
+        """Animal position pairs (i<j)"""
+        return np.array(list(combinations(range(self.n_animals), 2))).reshape(-1, 2)
+
+    @property
+    def ordered_pairs(self):
+        """Animal position ordered pairs (i!=j)"""
+        return np.array(list(permutations(range(self.n_animals), 2))).reshape(-1, 2)
+
+    def get_pair_labels(self, pairs):
+        return [f'{self.IDs[i]}_{self.IDs[j]}' for i, j in pairs]
+
+    def distance(self, node='chest', target=None):
+        """Returns T-series inter-animal distances of all pairs
+
+        :param node: node name of animals
+        :param target: node name of other animals. If None, same as node and only unordered pairs are returned
+        """
+        pairs = self.pairs if target is None else self.ordered_pairs
+        src, dst = self.get_node(node), self.get_node(target if target else node)
+        I, J = pairs.T
+        data = self.get_distance(dst[:, J]-src[:, I])
+        return pd.DataFrame(data, index=self.index, columns=self.get_pair_labels(pairs))
+
+    def relative_heading(self, node='chest'):
+        """Returns T-series angle (0~pi) between heading (neck to nose) of animal and direction to other animal's node
+        for all ordered pairs. 0 means facing to the other animal
+        """
+        I, J = self.ordered_pairs.T
+        heading = self.get_node('nose')-self.get_node('neck')
+        position = self.get_node(node)
+        data = self.get_angle(heading[:, I], position[:, J]-position[:, I])
+        return pd.DataFrame(data, index=self.index, columns=self.get_pair_labels(self.ordered_pairs))
+
+    def approach_velocity(self, node='chest'):
+        """Returns T-series velocity component of animal towards other animal's node for all ordered pairs.
+        Positive if approaching
+        """
+        I, J = self.ordered_pairs.T
+        position = self.get_node(node)
+        velocity = np.full_like(position, np.nan)
+        velocity[1:] = np.diff(position, axis=0)*self.frame_rate
+        direction = position[:, J]-position[:, I]
+        direction = direction/self.get_distance(direction)[..., np.newaxis]
+        data = self.get_dot_product(velocity[:, I], direction)
+        return pd.DataFrame(data, index=self.index, columns=self.get_pair_labels(self.ordered_pairs))
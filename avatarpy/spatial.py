@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from avatarpy.interval import Intervals
+
+class Box:
+    def __init__(self, xmin=-np.inf, xmax=np.inf, ymin=-np.inf, ymax=np.inf, zmin=-np.inf, zmax=np.inf):
+        r"""Box shaped region of interest. Unbounded axes are ignored"""
+        self.lower = np.array([xmin, ymin, zmin])
+        self.upper = np.array([xmax, ymax, zmax])
+
+    def __repr__(self):
+        return f'Box({self.lower.tolist()}, {self.upper.tolist()})'
+
+    def contains(self, points):
+        """Returns boolean array whether points (... x 3) are inside box"""
+        return ((points >= self.lower) & (points <= self.upper)).all(axis=-1)
+
+class Circle:
+    def __init__(self, center, radius):
+        r"""Circular region of interest on xy plane"""
+        self.center = np.asarray(center, dtype=float)[:2]
+        self.radius = radius
+
+    def __repr__(self):
+        return f'Circle({self.center.tolist()}, {self.radius})'
+
+    def contains(self, points):
+        """Returns boolean array whether points (... x 3) are inside circle on xy plane"""
+        d = points[..., :2]-self.center
+        return np.einsum('...i,...i->...', d, d) <= self.radius**2
+
+class Polygon:
+    def __init__(self, vertices):
+        r"""Polygonal region of interest on xy plane
+
+        :param vertices: list of (x, y) vertices
+        """
+        self.vertices = np.asarray(vertices, dtype=float)[:, :2]
+        assert len(self.vertices) >= 3, 'Polygon requires at least 3 vertices'
+
+    def __repr__(self):
+        return f'Polygon({self.vertices.tolist()})'
+
+    def contains(self, points):
+        """Returns boolean array whether points (... x 3) are inside polygon on xy plane (ray casting)"""
+        x, y = points[..., 0], points[..., 1]
+        inside = np.zeros(x.shape, dtype=bool)
+        for (x1, y1), (x2, y2) in zip(self.vertices, np.roll(self.vertices, -1, axis=0)):
+            crosses = (y1 > y) != (y2 > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = x1+(y-y1)*(x2-x1)/(y2-y1)
+            inside ^= crosses & (x < x_cross)
+        return inside
+
+class Spatial:
+    def __init__(self, parent=None):
+        self.__parent = parent
+
+    def __repr__(self):
+        return f'Spatial object of {self.__parent}'
+
+    def in_roi(self, roi, node='chest'):
+        """Returns T-series boolean whether node is inside roi. Can be directly used as annotation"""
+        data = roi.contains(self.__parent[node].values)
+        return pd.Series(data, index=self.__parent.index, name=f'{node}_in_{roi}')
+
+    def zones(self, rois, node='chest'):
+        """Returns T-series boolean dataframe whether node is inside each roi of dict(name=roi)"""
+        points = self.__parent[node].values
+        return pd.DataFrame({name:roi.contains(points) for name, roi in rois.items()}, index=self.__parent.index)
+
+    def annotate(self, roi, name, node='chest'):
+        """Adds roi mask of node to annotation and returns annotation dataframe"""
+        return self.__parent.annotation.add(by=lambda avatar: avatar.spatial.in_roi(roi, node), name=name)
+
+    def time_in_zone(self, roi, node='chest'):
+        """Returns total time (sec, or frames if frame_rate is not provided) node stayed inside roi"""
+        frames = self.in_roi(roi, node).values.sum()
+        frame_rate = self.__parent.frame_rate
+        return frames/frame_rate if frame_rate else frames
+
+    def entries(self, roi, node='chest'):
+        """Returns number of entries of node into roi. Staying inside roi from the first frame is not counted"""
+        intervals = Intervals.from_boolean(self.in_roi(roi, node).values)
+        return int((intervals.starts > 0).sum())
+
+    def zone_stats(self, rois, node='chest'):
+        """Returns dataframe of time_in_zone, entries and bouts of each roi of dict(name=roi)"""
+        frame_rate = self.__parent.frame_rate
+        zones = self.zones(rois, node)
+        stats = []
+        for name in zones.columns:
+            intervals = Intervals.from_boolean(zones[name].values)
+            frames = intervals.total
+            stats.append(dict(roi=name, time_in_zone=frames/frame_rate if frame_rate else frames,
+                entries=int((intervals.starts > 0).sum()), bouts=len(intervals)))
+        return pd.DataFrame(stats)
+
+    def occupancy(self, node='chest', bins=20, range=None, normalize=False):
+        """Returns occupancy heatmap (y bins x x bins) of node on xy plane. Unit is sec if frame_rate is provided
+
+        :param bins: number of bins or [xbins, ybins] (see np.histogram2d)
+        :param range: [[xmin, xmax], [ymin, ymax]]. If None, min and max of node coords
+        :param normalize: if True, returns fraction of time
+        """
+        points = self.__parent[node].values
+        valid = np.isfinite(points[:, :2]).all(axis=1)
+        H, xedges, yedges = np.histogram2d(points[valid, 0], points[valid, 1], bins=bins, range=range)
+        frame_rate = self.__parent.frame_rate
+        if normalize:
+            H = H/H.sum()
+        elif frame_rate:
+            H = H/frame_rate
+        xcenters, ycenters = (xedges[1:]+xedges[:-1])/2, (yedges[1:]+yedges[:-1])/2
+        return pd.DataFrame(H.T, index=pd.Index(ycenters, name='y'), columns=pd.Index(xcenters, name='x'))
+
+    def get_tree(self, node='chest', dims='xyz'):
+        """Returns cached scipy.spatial.cKDTree over all frames of node coords"""
+        from scipy.spatial import cKDTree
+
+        columns = ['xyz'.index(d) for d in dims]
+        def build():
+            points = self.__parent[node].values[:, columns]
+            # non-finite coords are moved far away so they never match queries
+            return cKDTree(np.where(np.isfinite(points), points, np.finfo(np.float32).max))
+        return self.__parent.get_cached(('kdtree', node, dims), build)
+
+    def near(self, point, radius, node='nose', dims='xyz'):
+        """Returns T-series boolean whether node is within radius of point (ex, object location) by KD-tree query
+
+        :param point: coords of point, same length as dims
+        :param dims: {'xyz'|'xy'|...} axes of distance
+        """
+        frames = self.get_tree(node, dims).query_ball_point(np.asarray(point, dtype=float), radius)
+        data = np.zeros(len(self.__parent.index), dtype=bool)
+        data[frames] = True
+        return pd.Series(data, index=self.__parent.index, name=f'{node}_near_{list(point)}')
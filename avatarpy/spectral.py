@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+class Spectral:
+    def __init__(self, parent=None):
+        self.__parent = parent
+
+    def __repr__(self):
+        return f'Spectral object of {self.__parent}'
+
+    @property
+    def fs(self):
+        """Sampling frequency of avatar (1 if frame_rate is not provided)"""
+        return self.__parent.frame_rate if self.__parent.frame_rate else 1
+
+    def get_array(self, data):
+        """Returns float64 array (N x columns) of data with non-finite values interpolated (edges filled)"""
+        if data.isna().values.any():
+            data = data.interpolate(limit_direction='both').fillna(0)
+        return data.values.astype(np.float64)
+
+    def get_nperseg(self, nperseg, n):
+        return max(1, min(self.__parent.get_window(nperseg), n))
+
+    def psd(self, feature, nperseg='2s', indices=None):
+        """Returns Welch power spectral density (freqs x columns) of all columns of feature by single call.
+        Cached if indices is None
+
+        :param nperseg: (int|str) segment length, int is frames, str is seconds (ex, '2s')
+        :param indices: see Describe.select
+        """
+        from scipy.signal import welch
+
+        def compute():
+            data = self.__parent.describe.select(self.__parent[feature], indices)
+            if not len(data): # empty selection, NaN row like corr and stat
+                return pd.DataFrame(np.nan, index=pd.Index([0.], name='frequency'), columns=data.columns)
+            freqs, Pxx = welch(self.get_array(data), fs=self.fs, nperseg=self.get_nperseg(nperseg, len(data)), axis=0)
+            return pd.DataFrame(Pxx, index=pd.Index(freqs, name='frequency'), columns=data.columns)
+        if indices is None:
+            return self.__parent.get_cached(('psd', feature, nperseg), compute)
+        return compute()
+
+    @staticmethod
+    def get_band_power(freqs, Pxx, bands):
+        """Returns band power (bands x ...) of Pxx (freqs x ...) integrated over [low, high) frequency of each band"""
+        df = freqs[1]-freqs[0] if len(freqs) > 1 else 1
+        masks = np.array([(freqs >= low) & (freqs < high) for low, high in bands], dtype=np.float64)
+        return np.tensordot(masks, Pxx, axes=1)*df
+
+    @staticmethod
+    def get_dominant_frequency(freqs, Pxx):
+        """Returns frequency (...) of maximum power (excluding DC) of Pxx (freqs x ...)"""
+        positive = freqs > 0
+        if not positive.any():
+            return np.full(Pxx.shape[1:], np.nan)
+        return freqs[positive][Pxx[positive].argmax(axis=0)]
+
+    @staticmethod
+    def get_spectral_entropy(freqs, Pxx):
+        """Returns normalized (0~1) Shannon entropy (...) of power distribution (excluding DC) of Pxx (freqs x ...)"""
+        Pxx = Pxx[freqs > 0]
+        if len(Pxx) < 2:
+            return np.full(Pxx.shape[1:], np.nan)
+        total = Pxx.sum(axis=0)
+        p = np.divide(Pxx, total, out=np.zeros_like(Pxx), where=total > 0)
+        logp = np.log(p, out=np.zeros_like(p), where=p > 0)
+        return -(p*logp).sum(axis=0)/np.log(len(p))
+
+    def band_power(self, feature, bands=[(0, 2), (2, 5), (5, 10)], nperseg='2s', indices=None):
+        """Returns band power (bands x columns) of feature. bands are list of (low, high) Hz"""
+        psd = self.psd(feature, nperseg, indices)
+        return pd.DataFrame(self.get_band_power(psd.index.values, psd.values, bands),
+            index=[f'band_power_{low}_{high}' for low, high in bands], columns=psd.columns)
+
+    def dominant_frequency(self, feature, nperseg='2s', indices=None):
+        """Returns dominant frequency (Hz) of each column of feature"""
+        psd = self.psd(feature, nperseg, indices)
+        return pd.Series(self.get_dominant_frequency(psd.index.values, psd.values), index=psd.columns)
+
+    def spectral_entropy(self, feature, nperseg='2s', indices=None):
+        """Returns normalized spectral entropy (0~1) of each column of feature"""
+        psd = self.psd(feature, nperseg, indices)
+        return pd.Series(self.get_spectral_entropy(psd.index.values, psd.values), index=psd.columns)
+
+    def get_spectrogram(self, feature, window='2s', step=None):
+        """Returns (freqs, times, Sxx) short-time spectrogram of all columns of feature by single call.
+        Sxx is freqs x columns x times and times are in avatar index unit. Cached
+
+        :param window: (int|str) segment length, int is frames, str is seconds (ex, '2s')
+        :param step: (int|str) distance between segments (default: half of window)
+        """
+        from scipy.signal import spectrogram
+
+        def compute():
+            data = self.__parent[feature]
+            nperseg = self.get_nperseg(window, len(data))
+            hop = self.__parent.get_window(step) if step else max(1, nperseg//2)
+            freqs, times, Sxx = spectrogram(self.get_array(data), fs=self.fs, nperseg=nperseg, noverlap=max(0, nperseg-hop), axis=0)
+            return freqs, times+self.__parent.index[0], Sxx
+        return self.__parent.get_cached(('spectrogram', feature, window, step), compute)
+
+    def spectrogram(self, feature, window='2s', step=None):
+        """Returns spectrogram (segment times x (target, frequency)) of feature. see get_spectrogram"""
+        freqs, times, Sxx = self.get_spectrogram(feature, window, step)
+        columns = pd.MultiIndex.from_product([self.__parent[feature].columns, freqs], names=['target', 'frequency'])
+        return pd.DataFrame(Sxx.transpose(2, 1, 0).reshape(len(times), -1), index=pd.Index(times, name='time'), columns=columns)
+
+    def windowed(self, feature, window='2s', step=None, bands=[(0, 2), (2, 5), (5, 10)]):
+        """Returns windowed spectral features (segment times x (type, target)) of feature:
+        band powers, dominant frequency and spectral entropy of each segment of spectrogram
+        """
+        freqs, times, Sxx = self.get_spectrogram(feature, window, step)
+        values = np.concatenate([
+            self.get_band_power(freqs, Sxx, bands),
+            self.get_dominant_frequency(freqs, Sxx)[np.newaxis],
+            self.get_spectral_entropy(freqs, Sxx)[np.newaxis],
+        ]) # types x columns x times
+        types = [f'band_power_{low}_{high}' for low, high in bands]+['dominant_frequency', 'spectral_entropy']
+        columns = pd.MultiIndex.from_product([types, self.__parent[feature].columns], names=['type', 'target'])
+        return pd.DataFrame(values.transpose(2, 0, 1).reshape(len(times), -1), index=pd.Index(times, name='time'), columns=columns)
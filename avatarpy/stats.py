@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+def correct(pvalues, method='fdr_bh'):
+    r"""Returns p-values corrected for multiple comparisons. NaN p-values are ignored
+
+    :param method: {'fdr_bh'(default)|'holm'|'bonferroni'|None}
+    """
+    p = np.asarray(pvalues, dtype=np.float64)
+    if method is None:
+        return p
+    corrected = np.full_like(p, np.nan)
+    valid = np.isfinite(p)
+    pv = p[valid]
+    m = len(pv)
+    if m == 0:
+        return corrected
+    if method == 'bonferroni':
+        adj = pv*m
+    elif method == 'holm':
+        order = np.argsort(pv)
+        adj = np.empty(m)
+        adj[order] = np.maximum.accumulate(pv[order]*(m-np.arange(m)))
+    elif method == 'fdr_bh':
+        order = np.argsort(pv)[::-1]
+        adj = np.empty(m)
+        adj[order] = np.minimum.accumulate(pv[order]*m/np.arange(m, 0, -1))
+    else:
+        raise Exception("Wrong argument for method, should be 'fdr_bh', 'holm', 'bonferroni' or None")
+    corrected[valid] = np.minimum(adj, 1)
+    return corrected
+
+def count_exceedances(X, mask, n_a, observed, n_permutations, seed, batch_size=1000):
+    r"""Returns number of label permutations whose |mean difference| is not smaller than |observed| for each row.
+    Mean differences of a batch of permutations are computed for all rows by single matrix product
+
+    :param X: np.array (rows x subjects) with non-finite values set to 0
+    :param mask: np.array (rows x subjects) of finite values
+    :param n_a: number of subjects in first group, first n_a subjects are first group in observed
+    """
+    rng = np.random.default_rng(seed)
+    n = X.shape[1]
+    total, count = X.sum(axis=1, keepdims=True), mask.sum(axis=1, keepdims=True)
+    tol = 1e-12*np.maximum(np.abs(observed), 1)
+    exceed = np.zeros(len(X), dtype=np.int64)
+    for i in range(0, n_permutations, batch_size):
+        size = min(batch_size, n_permutations-i)
+        G = (rng.random((size, n)).argsort(axis=1) < n_a).astype(np.float64).T # subjects x permutations
+        sum_a, cnt_a = X @ G, mask @ G
+        with np.errstate(invalid='ignore', divide='ignore'):
+            diff = sum_a/cnt_a-(total-sum_a)/(count-cnt_a)
+        exceed += (np.abs(diff) >= np.abs(observed)[:, np.newaxis]-tol[:, np.newaxis]).sum(axis=1)
+    return exceed
+
+class GroupStats:
+    def __init__(self, df, group='tag', keys=None, ID='ID', value='value', aggfunc='mean'):
+        r"""Group comparison of long describe dataframe (AvaLens.describe, SearchEvent.describe) for all feature rows at once
+
+        Describe is pivoted to matrix of feature rows (keys) x subjects (ID). Repeated rows of a subject
+        (ex, multiple events) are aggregated by aggfunc.
+
+        :param group: column of group label of subjects (ex, 'tag' of tag_policy='dirname', 'genotype')
+        :param keys: columns identifying feature row (default: feature, category, type, target and event if exists)
+        """
+        if keys is None:
+            keys = [key for key in ['event', 'feature', 'category', 'type', 'target'] if key in df.columns]
+        groups = df.groupby(ID)[group].agg(lambda x: x.unique())
+        assert all(np.ndim(g) == 0 or len(g) == 1 for g in groups), 'each subject should belong to single group'
+        self.groups = groups.map(lambda g: g if np.ndim(g) == 0 else g[0])
+        self.matrix = df.pivot_table(index=keys, columns=ID, values=value, aggfunc=aggfunc, dropna=False)[self.groups.index]
+        self.keys = keys
+
+    def __repr__(self):
+        return f'GroupStats({self.matrix.shape[0]} rows, groups={dict(self.groups.value_counts())})'
+
+    def get_groups(self, a=None, b=None):
+        """Returns arrays (rows x subjects) of group a and b"""
+        labels = self.groups.unique()
+        if a is None and b is None:
+            assert len(labels) == 2, f'groups a and b should be given among {list(labels)}'
+            a, b = sorted(labels)
+        assert a in labels and b in labels, f'groups should be among {list(labels)}'
+        X = self.matrix.values.astype(np.float64)
+        return a, b, X[:, (self.groups == a).values], X[:, (self.groups == b).values]
+
+    def ttest(self, a=None, b=None, equal_var=False):
+        """Returns (statistic, pvalue) of two-sided t-test (Welch's if not equal_var) of all rows ignoring NaNs"""
+        from scipy.stats import t
+        _, _, A, B = self.get_groups(a, b)
+        na, nb = np.isfinite(A).sum(axis=1), np.isfinite(B).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ma, mb = np.nanmean(A, axis=1), np.nanmean(B, axis=1)
+            va, vb = np.nanvar(A, axis=1, ddof=1), np.nanvar(B, axis=1, ddof=1)
+            if equal_var:
+                df = na+nb-2
+                se = np.sqrt(((na-1)*va+(nb-1)*vb)/df*(1/na+1/nb))
+            else:
+                se2a, se2b = va/na, vb/nb
+                df = (se2a+se2b)**2/(se2a**2/(na-1)+se2b**2/(nb-1))
+                se = np.sqrt(se2a+se2b)
+            statistic = (ma-mb)/se
+        return statistic, 2*t.sf(np.abs(statistic), df)
+
+    def mannwhitney(self, a=None, b=None):
+        """Returns (statistic U of group a, pvalue) of two-sided Mann-Whitney U test of all rows ignoring NaNs"""
+        from scipy.stats import mannwhitneyu
+        _, _, A, B = self.get_groups(a, b)
+        result = mannwhitneyu(A, B, axis=1, nan_policy='omit')
+        return np.asarray(result.statistic, dtype=np.float64), np.asarray(result.pvalue, dtype=np.float64)
+
+    def permutation(self, a=None, b=None, n_permutations=10000, random_state=None, n_jobs=1, batch_size=1000):
+        """Returns (mean difference, pvalue) of two-sided label permutation test of all rows ignoring NaNs
+
+        :param n_jobs: (int) number of processes sharing permutations
+        """
+        _, _, A, B = self.get_groups(a, b)
+        X = np.concatenate([A, B], axis=1)
+        mask = np.isfinite(X)
+        X = np.where(mask, X, 0)
+        mask = mask.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            observed = np.nanmean(A, axis=1)-np.nanmean(B, axis=1)
+        n_a = A.shape[1]
+        seeds = np.random.SeedSequence(random_state).spawn(n_jobs)
+        sizes = [len(s) for s in np.array_split(np.arange(n_permutations), n_jobs)]
+        if n_jobs == 1:
+            exceed = count_exceedances(X, mask, n_a, observed, n_permutations, seeds[0], batch_size)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [executor.submit(count_exceedances, X, mask, n_a, observed, size, seed, batch_size)
+                    for size, seed in zip(sizes, seeds)]
+                exceed = sum(future.result() for future in futures)
+        pvalue = np.where(np.isfinite(observed), (exceed+1)/(n_permutations+1), np.nan)
+        return observed, pvalue
+
+    def compare(self, a=None, b=None, test='ttest', correction='fdr_bh', alpha=0.05, **kwargs):
+        """Returns dataframe of group means, test statistic and corrected p-values of all feature rows
+
+        :param test: {'ttest'(default)|'mannwhitney'|'permutation'}
+        :param correction: {'fdr_bh'(default)|'holm'|'bonferroni'|None}
+        :param kwargs: passed to test method (ex, n_permutations=10000, n_jobs=4)
+        """
+        assert test in ['ttest', 'mannwhitney', 'permutation'], "test should be 'ttest', 'mannwhitney' or 'permutation'"
+        a, b, A, B = self.get_groups(a, b)
+        statistic, pvalue = getattr(self, test)(a, b, **kwargs)
+        with np.errstate(invalid='ignore'):
+            df = pd.DataFrame(dict(
+                group_a=a, group_b=b,
+                n_a=np.isfinite(A).sum(axis=1), n_b=np.isfinite(B).sum(axis=1),
+                mean_a=np.nanmean(A, axis=1), mean_b=np.nanmean(B, axis=1),
+                test=test, statistic=statistic, pvalue=pvalue,
+            ), index=self.matrix.index)
+        df['pvalue_corrected'] = correct(pvalue, correction)
+        df['significant'] = df['pvalue_corrected'] < alpha
+        return df
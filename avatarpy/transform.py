@@ -1,6 +1,6 @@
 import numpy as np
+import pandas as pd
 from copy import deepcopy
-from sklearn.linear_model import LinearRegression
 
 class Transform:
     def __init__(self, parent=None):
@@ -9,27 +9,35 @@ class Transform:
     def __repr__(self):
         return f'Transform object of {self.__parent}'
 
-    def level(self):
+    def get_level_coef(self):
+        """Returns floor slope (a, b) of horizontal regression z = a*x + b*y + c on lfoot and rfoot node data
+        """
+        data = self.__parent.get_node_data(['lfoot', 'rfoot'])
+        data = data[np.isfinite(data[['x', 'y', 'z']].values).all(axis=1)]
+        X = np.column_stack([data['x'].values, data['y'].values, np.ones(len(data))])
+        (a, b, _), *_ = np.linalg.lstsq(X, data['z'].values, rcond=None)
+        return a, b
+
+    def level(self, coef=None):
         """수평맞추기
+
+        :param coef: (a, b) floor slope. If None, regressed from lfoot and rfoot node data. See also get_level_coef
         """
         avatar = deepcopy(self.__parent)
-        data = avatar.get_node_data(['lfoot', 'rfoot'])
-
-        # Horizontal Regression on lfoot and rfoot node data
-        model = LinearRegression() 
-        model.fit(data[['x','y']], data[['z']])
-        a, b = model.coef_[0]
-        vector1 = np.stack([np.array([-a, -b, 1])]*len(avatar.data))
-        vector2 = np.stack([np.array([ 0,  0, 1])]*len(avatar.data))
+        a, b = self.get_level_coef() if coef is None else coef
+        # single rotation matrix (1 x 3 x 3) broadcasts over all frames
+        vector1 = np.array([[-a, -b, 1]])
+        vector2 = np.array([[ 0,  0, 1]])
         R = avatar.get_rotation_matrix(vector1, vector2)
         avatar = avatar.transform.rotate(R)
+        avatar._leveled = True
         return avatar
 
     def add(self, vector):
         avatar = deepcopy(self.__parent)
         for k, v in avatar.nodes.items():
             cols = avatar._nodes[k]
-            avatar.data[cols] = v+vector
+            avatar.data[cols] = (v+vector).astype(avatar.dtype)
         avatar.set_nodes()
         avatar.set_vectors()
         return avatar
@@ -38,7 +46,7 @@ class Transform:
         avatar = deepcopy(self.__parent)
         for k, v in avatar.nodes.items():
             cols = avatar._nodes[k]
-            avatar.data[cols] = v-vector
+            avatar.data[cols] = (v-vector).astype(avatar.dtype)
         avatar.set_nodes()
         avatar.set_vectors()
         return avatar
@@ -47,7 +55,7 @@ class Transform:
         avatar = deepcopy(self.__parent)
         for k, v in avatar.nodes.items():
             cols = avatar._nodes[k]
-            avatar.data[cols] = v-avatar[node]
+            avatar.data[cols] = (v-avatar[node]).astype(avatar.dtype)
         avatar.set_nodes()
         avatar.set_vectors()
         return avatar
@@ -56,7 +64,7 @@ class Transform:
         avatar = deepcopy(self.__parent)
         for k, v in avatar.nodes.items():
             cols = avatar._nodes[k]
-            avatar.data[cols] = np.einsum('nij,nj->ni', rotation_matrix, v)
+            avatar.data[cols] = np.einsum('...ij,...j->...i', rotation_matrix, v).astype(avatar.dtype)
         avatar.set_nodes()
         avatar.set_vectors()
         return avatar
@@ -74,4 +82,26 @@ class Transform:
         avatar = avatar.transform.fix(node=offset_node)
         R = avatar.get_rotation_matrix(avatar.xy_projection(direction_node), avatar.get_unit_vector(axis=axis))
         avatar = avatar.transform.rotate(R)
-        return avatar
\ No newline at end of file
+        return avatar
+
+    def resample(self, frame_rate, method='poly'):
+        """Returns avatar resampled to frame_rate. Annotations are mapped to nearest frames
+
+        :param method: {'poly'(default)|'interp'}, see Core.resample_array
+        """
+        parent = self.__parent
+        assert parent.frame_rate, 'frame_rate of avatar is required for resampling'
+        avatar = deepcopy(parent)
+        data = parent.resample_array(parent.data.values, parent.frame_rate, frame_rate, method=method)
+        avatar.frame_rate = frame_rate
+        start = parent.index[0] if len(parent.index) else 0
+        avatar.data = pd.DataFrame(data.astype(parent.dtype), index=start+np.arange(len(data))/frame_rate, columns=parent.data.columns)
+        avatar.set_nodes()
+        avatar.set_vectors()
+
+        avatar._annotation = None
+        labels = parent.annotation.add()
+        if len(labels.columns):
+            positions = np.minimum(np.round((avatar.index.values-start)*parent.frame_rate).astype(int), len(labels)-1)
+            avatar.annotation.update(labels.iloc[positions].set_axis(avatar.index, axis=0))
+        return avatar
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+class FeatureWindows:
+    def __init__(self, parent, features, window=20, stride=1, batch_size=1024, flatten=False, dropna=False):
+        r"""Fixed-size, strided feature windows of avatar streamed in batches of contiguous arrays
+
+        :param parent: Avatar
+        :param features: list of avatar feature names (ex, ['velocity', 'angle'])
+        :param window: (int) number of frames in a window
+        :param stride: (int) number of frames between window starts
+        :param batch_size: (int) number of windows in a batch
+        :param flatten: (bool) if True, batches are (batch x window*columns), else (batch x window x columns)
+        :param dropna: (bool) if True, windows containing non-finite values are dropped from batches
+        """
+        self.__parent = parent
+        self.window = window
+        self.stride = stride
+        self.batch_size = batch_size
+        self.flatten = flatten
+        self.dropna = dropna
+
+        arrays, columns = [], []
+        for feature in features:
+            data = parent[feature]
+            arrays.append(data.values)
+            columns.extend([(feature, target) for target in data.columns])
+        self._arrays = arrays
+        self._columns = pd.MultiIndex.from_tuples(columns, names=['feature', 'target'])
+        self._n_frames = len(parent.index)
+
+    def __repr__(self):
+        return f'FeatureWindows of {self.__parent} ({len(self)} windows x {self.window} frames x {len(self.columns)} columns)'
+
+    @property
+    def columns(self):
+        """(feature, target) column index of windows. Flattened windows are ordered window-major"""
+        return self._columns
+
+    @property
+    def starts(self):
+        """Frame positions of window starts"""
+        return np.arange(0, max(self._n_frames-self.window+1, 0), self.stride)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        """Yields (starts, batch) where starts are frame positions of window starts in batch"""
+        starts = self.starts
+        # (frames-window+1) x columns x window views without copy
+        views = [sliding_window_view(arr, self.window, axis=0) for arr in self._arrays]
+        dtype = np.result_type(*self._arrays)
+        for i in range(0, len(starts), self.batch_size):
+            batch_starts = starts[i:i+self.batch_size]
+            first, last = batch_starts[0], batch_starts[-1]
+            batch = np.empty((len(batch_starts), self.window, len(self.columns)), dtype=dtype)
+            col = 0
+            for view in views:
+                n_col = view.shape[1]
+                batch[:, :, col:col+n_col] = view[first:last+1:self.stride].transpose(0, 2, 1)
+                col += n_col
+            if self.dropna:
+                valid = np.isfinite(batch).all(axis=(1, 2))
+                batch_starts, batch = batch_starts[valid], batch[valid]
+            if self.flatten:
+                batch = batch.reshape(len(batch), -1)
+            yield batch_starts, batch
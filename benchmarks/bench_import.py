@@ -0,0 +1,50 @@
+"""Import-time budget of avatarpy
+
+Measures `import avatarpy` in fresh interpreters against the unavoidable numpy + pandas import,
+and checks that heavy optional dependencies are deferred to the point of use.
+
+usage: python benchmarks/bench_import.py [--repeat 5] [--budget 0.15]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HEAVY_MODULES = ['plotly', 'sklearn', 'scipy', 'pkg_resources', 'umap', 'matplotlib', 'seaborn']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter()-t
+print(json.dumps(dict(elapsed=elapsed, heavy=[m for m in {heavy} if m in sys.modules])))
+"""
+
+def measure(module, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    results = []
+    for _ in range(repeat):
+        code = SNIPPET.format(module=module, heavy=HEAVY_MODULES)
+        out = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out))
+    return min(r['elapsed'] for r in results), results[0]['heavy']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.15, help='allowed seconds on top of numpy + pandas import')
+    args = parser.parse_args()
+
+    base, _ = measure('numpy, pandas', args.repeat)
+    total, heavy = measure('avatarpy', args.repeat)
+    overhead = total-base
+    print(f'numpy + pandas : {base:.3f} s')
+    print(f'avatarpy       : {total:.3f} s (overhead {overhead:.3f} s, budget {args.budget:.3f} s)')
+    print(f'heavy imported : {heavy}')
+    if heavy or overhead > args.budget:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
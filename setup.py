@@ -13,6 +13,7 @@ setup(
     python_requires     = '>=3',
     package_data={'avatarpy': ['data/*.csv']},
     include_package_data = True, 
+    entry_points        = {'console_scripts': ['avatarpy=avatarpy.cli:main']},
     zip_safe            = False,
     classifiers         = [
         'Programming Language :: Python :: 3.6',
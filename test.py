@@ -7,4 +7,5 @@ from pprint import pprint
 
 csv_path = dataset['freely_moving']
 avatar = Avatar(csv_path)
-print(avatar.area)
\ No newline at end of file
+print(avatar.area)
+print(avatar.describe(indices=avatar.index[:0])) # empty event, statistics only